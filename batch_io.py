@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+import time
+import errno
+import select
+import socket
+import struct
+import ctypes
+import ctypes.util
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 표준 라이브러리에 sendmmsg/recvmmsg 가 없으므로 libc 를 직접 호출 (없으면 한 패킷씩 보내는 경로 사용)
+_libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+HAVE_MMSG = hasattr(_libc, 'sendmmsg') and hasattr(_libc, 'recvmmsg')
+
+MSG_DONTWAIT = 0x40
+SO_TIMESTAMPNS = 35
+SCM_TIMESTAMPNS = SO_TIMESTAMPNS
+
+_SOCKADDR_IN = struct.Struct('=HH4s8x')
+# struct cmsghdr (cmsg_len, cmsg_level, cmsg_type) + struct timespec
+_CMSG_TIMESPEC = struct.Struct('=Qiiqq')
+_CONTROL_SIZE = 64
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_Iovec)), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _Msghdr), ('msg_len', ctypes.c_uint)]
+
+
+if HAVE_MMSG:
+    _libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    _libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+
+
+def _address(buf: bytearray) -> int:
+    return ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf))
+
+
+_MMSG_SIZE = ctypes.sizeof(_Mmsghdr)
+_IOV_SIZE = ctypes.sizeof(_Iovec)
+_IOV_LEN = struct.Struct('@N')
+_MSG_LEN = struct.Struct('@I')
+_MSG_LEN_OFFSET = _Mmsghdr.msg_len.offset
+_CONTROLLEN_OFFSET = _Mmsghdr.msg_hdr.offset + _Msghdr.msg_controllen.offset
+_IOV_LEN_OFFSET = _Iovec.iov_len.offset
+
+
+class _MessageVector:
+    """미리 할당한 mmsghdr/iovec 배열과 패킷 버퍼 (size 개 x slot_size 바이트)
+
+    배열은 bytearray 위에 두어 패킷마다 ctypes 필드 객체를 만들지 않고 struct 로 길이만 읽고 쓴다.
+    pristine 은 초기 헤더 배열의 사본으로, recvmmsg 전에 한 번에 복사해 길이/플래그 필드를 되돌린다.
+    """
+
+    def __init__(self, size: int, slot_size: int, control: bool = False):
+        self.size = size
+        self.slot_size = slot_size
+        self.buf = bytearray(size * slot_size)
+        self.names = bytearray(size * _SOCKADDR_IN.size)
+        self.control = bytearray(size * _CONTROL_SIZE) if control else None
+        self.iov_mem = bytearray(size * _IOV_SIZE)
+        self.msgs_mem = bytearray(size * _MMSG_SIZE)
+        iov = (_Iovec * size).from_buffer(self.iov_mem)
+        msgs = (_Mmsghdr * size).from_buffer(self.msgs_mem)
+        base, names = _address(self.buf), _address(self.names)
+        control_base = _address(self.control) if control else 0
+        self.msgs_address = ctypes.addressof(msgs)
+        iov_address = ctypes.addressof(iov)
+        for i in range(size):
+            iov[i].iov_base = base + i * slot_size
+            iov[i].iov_len = slot_size
+            hdr = msgs[i].msg_hdr
+            hdr.msg_name = names + i * _SOCKADDR_IN.size
+            hdr.msg_namelen = _SOCKADDR_IN.size
+            hdr.msg_iov = ctypes.cast(iov_address + i * _IOV_SIZE, ctypes.POINTER(_Iovec))
+            hdr.msg_iovlen = 1
+            if control:
+                hdr.msg_control = control_base + i * _CONTROL_SIZE
+                hdr.msg_controllen = _CONTROL_SIZE
+        del iov, msgs
+        self.pristine = bytes(self.msgs_mem)
+
+    def pointer(self, index: int) -> int:
+        return self.msgs_address + index * _MMSG_SIZE
+
+
+class BatchSender:
+    """sendmmsg 한 번으로 최대 size 개의 IPv4 패킷을 보내는 송신기
+
+    queue() 는 패킷 바이트를 미리 할당한 슬롯으로 바로 복사하므로 템플릿 버퍼를 다음 프로브에 재사용해도 된다.
+    slot_size 보다 큰 패킷은 다음 슬롯을 덮어쓰므로 ValueError 로 거부한다.
+    flush() 는 시스템 콜 직전의 시각을 배치의 모든 패킷 전송 시각으로 반환한다.
+    """
+
+    def __init__(self, sock: socket.socket, size: int = 64, slot_size: int = 2048):
+        self.sock = sock
+        self.size = size
+        self.slot_size = slot_size
+        self.calls = 0
+        self._count = 0
+        self._queued = []
+        self._vector = _MessageVector(size, slot_size) if HAVE_MMSG else None
+        if self._vector is not None:
+            # 슬롯별 현재 길이 (같은 템플릿이면 iovec 을 다시 쓰지 않음), 주소는 AF_INET/포트 0 으로 미리 채움
+            self._lengths = [slot_size] * size
+            for i in range(size):
+                _SOCKADDR_IN.pack_into(self._vector.names, i * _SOCKADDR_IN.size, socket.AF_INET, 0, bytes(4))
+
+    def queue(self, data, ip_addr: Optional[str] = None, port: int = 0) -> bool:
+        """패킷 하나를 다음 슬롯에 넣고, 배치가 가득 찼으면 True (호출한 쪽이 flush)
+
+        ip_addr 가 없으면 IP_HDRINCL 패킷으로 보고 IPv4 헤더의 목적지 주소(16~19 바이트)를 그대로 사용한다.
+        """
+        if len(data) > self.slot_size:
+            raise ValueError(f"패킷 크기 {len(data)} 바이트가 슬롯 크기 {self.slot_size} 바이트보다 큽니다")
+        vector = self._vector
+        if vector is None:
+            self._queued.append((bytes(data), (ip_addr or socket.inet_ntoa(data[16:20]), port)))
+        else:
+            i = self._count
+            size = len(data)
+            offset = i * vector.slot_size
+            vector.buf[offset:offset + size] = data
+            if self._lengths[i] != size:
+                _IOV_LEN.pack_into(vector.iov_mem, i * _IOV_SIZE + _IOV_LEN_OFFSET, size)
+                self._lengths[i] = size
+            name = i * _SOCKADDR_IN.size
+            if ip_addr is None:
+                vector.names[name + 4:name + 8] = data[16:20]
+            else:
+                _SOCKADDR_IN.pack_into(vector.names, name, socket.AF_INET, socket.htons(port),
+                                       socket.inet_aton(ip_addr))
+        self._count += 1
+        return self._count >= self.size
+
+    def flush(self) -> List[float]:
+        """모아 둔 패킷을 보내고 패킷별 전송 시각 목록 반환"""
+        count = self._count
+        if count == 0:
+            return []
+        sent_at = time.time()
+        self._count = 0
+        if self._vector is None:
+            for data, address in self._queued:
+                self.sock.sendto(data, address)
+                self.calls += 1
+            self._queued.clear()
+            return [sent_at] * count
+        done = 0
+        while done < count:
+            sent = _libc.sendmmsg(self.sock.fileno(), self._vector.pointer(done), count - done, 0)
+            self.calls += 1
+            if sent < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EINTR, errno.EAGAIN, errno.ENOBUFS):
+                    continue
+                raise OSError(err, f"sendmmsg: {errno.errorcode.get(err, err)}")
+            done += sent
+        return [sent_at] * count
+
+    def send(self, packets: Sequence[Tuple[bytes, str, int]]) -> List[float]:
+        """[(바이트, 목적지 주소, 목적지 포트), ...] 를 size 개씩 보내고 패킷별 전송 시각 목록 반환"""
+        timestamps = []
+        for data, ip_addr, port in packets:
+            if self.queue(data, ip_addr, port):
+                timestamps.extend(self.flush())
+        timestamps.extend(self.flush())
+        return timestamps
+
+
+class BatchReceiver:
+    """recvmmsg 한 번으로 소켓에 쌓인 패킷을 최대 size 개까지 꺼내는 수신기
+
+    SO_TIMESTAMPNS 를 켜서 패킷마다 커널 수신 시각을 받는다.
+    반환하는 memoryview 는 수신 버퍼를 가리키므로 다음 recv() 전에 파싱을 끝내야 한다.
+    """
+
+    def __init__(self, sock: socket.socket, size: int = 64, slot_size: int = 2048):
+        self.sock = sock
+        self.size = size
+        self.calls = 0
+        self.sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        self._vector = _MessageVector(size, slot_size, control=True) if HAVE_MMSG else None
+        self._single = bytearray(slot_size)
+        self._poll = select.poll()
+        self._poll.register(sock.fileno(), select.POLLIN)
+
+    def recv(self, timeout: float = 0.2) -> List[Tuple[float, memoryview]]:
+        """timeout 초 안에 도착한 패킷들의 [(커널 수신 시각, 패킷), ...] (없으면 빈 목록)"""
+        if self._vector is None:
+            if not self._poll.poll(timeout * 1000):
+                return []
+            size = self.sock.recv_into(self._single)
+            self.calls += 1
+            return [(time.time(), memoryview(self._single)[:size])]
+        # 이미 쌓여 있으면 poll 없이 바로 꺼내고, 비어 있을 때만 poll 로 기다림
+        count = self._recvmmsg()
+        if count == 0:
+            if not self._poll.poll(timeout * 1000):
+                return []
+            count = self._recvmmsg()
+        vector = self._vector
+        now = time.time()
+        view = memoryview(vector.buf)
+        packets = []
+        for i in range(count):
+            received = now
+            if _IOV_LEN.unpack_from(vector.msgs_mem, i * _MMSG_SIZE + _CONTROLLEN_OFFSET)[0] >= _CMSG_TIMESPEC.size:
+                _, level, kind, sec, nsec = _CMSG_TIMESPEC.unpack_from(vector.control, i * _CONTROL_SIZE)
+                if level == socket.SOL_SOCKET and kind == SCM_TIMESTAMPNS:
+                    received = sec + nsec * 1e-9
+            offset = i * vector.slot_size
+            length = _MSG_LEN.unpack_from(vector.msgs_mem, i * _MMSG_SIZE + _MSG_LEN_OFFSET)[0]
+            packets.append((received, view[offset:offset + length]))
+        return packets
+
+    def _recvmmsg(self) -> int:
+        vector = self._vector
+        vector.msgs_mem[:] = vector.pristine
+        count = _libc.recvmmsg(self.sock.fileno(), vector.pointer(0), self.size, MSG_DONTWAIT, None)
+        self.calls += 1
+        if count < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EINTR, errno.EAGAIN):
+                return 0
+            raise OSError(err, f"recvmmsg: {errno.errorcode.get(err, err)}")
+        return count
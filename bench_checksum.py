@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import os
+import sys
+import timeit
+import argparse
+import logging
+import tcppacket as rs
+
+# 로깅 설정
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+
+def _per_call(stmt, number: int) -> float:
+    """한 번 호출에 걸린 평균 시간 (마이크로초, 5회 반복 중 최솟값)"""
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def bench_checksum(sizes, number: int):
+    """기존 checksum (2바이트씩 Python 루프) 과 fast_checksum (버퍼 전체) 비교"""
+    logger.info("=" * 60)
+    logger.info("체크섬 마이크로벤치마크 (호출당 us)")
+    logger.info("=" * 60)
+    for size in sizes:
+        msg = bytearray(os.urandom(size))
+        # 두 함수의 바이트 순서만 다르므로 같은 값인지 먼저 확인
+        assert rs.fast_checksum(msg) == int.from_bytes(rs.checksum(msg).to_bytes(2, 'little'), 'big')
+        slow = _per_call(lambda: rs.checksum(msg), number)
+        fast = _per_call(lambda: rs.fast_checksum(msg), number)
+        logger.info(f"{size:5d} 바이트: checksum {slow:8.2f}, fast_checksum {fast:6.2f} ({slow / fast:.1f}배)")
+
+
+def bench_template(number: int):
+    """홉마다 TTL 만 바꾸는 UDP 프로브, 대상마다 dst/포트/seq 를 바꾸는 SYN 의 패킷 생성 비용"""
+    logger.info("=" * 60)
+    logger.info("프로브 생성 비용 (패킷당 us)")
+    logger.info("=" * 60)
+    udp = rs.udp_template('192.0.2.1', '198.51.100.7', 53001, 80, tos=1)
+    syn = rs.tcp_template('192.0.2.1', '198.51.100.7', 40000, 80, flags=(0, 1, 1, 0, 0, 0, 0, 1, 0),
+                          options=b'\x02\x04\x05\xb4')
+
+    def udp_patch():
+        udp.set_ttl(17)
+        return udp.packet()
+
+    def udp_rebuild():
+        return rs.construct_ip_header('192.0.2.1', '198.51.100.7', tos=1, ttl=17, proto=17) + \
+            rs.construct_udp_header('192.0.2.1', '198.51.100.7', 53001, 80)
+
+    def syn_patch():
+        syn.set_dst('203.0.113.9')
+        syn.set_ports(srcp=41234)
+        syn.set_seq(0x12345678)
+        return syn.packet()
+
+    results = [
+        ('UDP 템플릿 (set_ttl)', _per_call(udp_patch, number)),
+        ('UDP construct_*_header', _per_call(udp_rebuild, number)),
+        ('SYN 템플릿 (dst/port/seq)', _per_call(syn_patch, number)),
+    ]
+    try:
+        from scapy.all import IP, TCP, UDP
+        results.append(('UDP scapy bytes(IP()/UDP())',
+                        _per_call(lambda: bytes(IP(dst='198.51.100.7', ttl=17, tos=1) / UDP(sport=53001, dport=80)),
+                                  max(1, number // 20))))
+        results.append(('SYN scapy bytes(IP()/TCP())',
+                        _per_call(lambda: bytes(IP(dst='203.0.113.9') / TCP(sport=41234, dport=80, flags='SEC',
+                                                                            seq=0x12345678,
+                                                                            options=[('MSS', 1460)])),
+                                  max(1, number // 20))))
+    except ImportError:
+        logger.info("scapy 가 없어 scapy 비교는 건너뜁니다.")
+    for name, per_packet in results:
+        logger.info(f"{name:28s} {per_packet:8.2f} us ({1e6 / per_packet:,.0f} pps)")
+    logger.info("=" * 60)
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description='tcppacket 체크섬/프로브 템플릿 마이크로벤치마크')
+    parser.add_argument('--sizes', default='20,40,60,576,1500', help='체크섬 버퍼 크기 목록 (기본값: 20,40,60,576,1500)')
+    parser.add_argument('--number', type=int, default=20000, help='측정당 호출 횟수 (기본값: 20000)')
+
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    bench_checksum(sizes, args.number)
+    bench_template(args.number)
+
+
+if __name__ == "__main__":
+    main()
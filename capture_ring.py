@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import mmap
+import select
+import socket
+import struct
+import ctypes
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple
+from tcppacket import ICMP_ERROR_TYPES
+
+logger = logging.getLogger(__name__)
+
+# linux/if_packet.h, linux/filter.h, asm-generic/socket.h
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+SO_ATTACH_FILTER = 26
+ETH_P_IP = 0x0800
+
+# classic BPF 명령 (code, jt, jf, k)
+BPF_LD_B_ABS = 0x30
+BPF_LD_H_ABS = 0x28
+BPF_LD_B_IND = 0x50
+BPF_LDX_B_MSH = 0xb1
+BPF_JEQ_K = 0x15
+BPF_JSET_K = 0x45
+BPF_RET_K = 0x06
+
+# tpacket_block_desc: block_status, num_pkts, offset_to_first_pkt
+BLOCK_HEADER = struct.Struct('=III')
+BLOCK_STATUS_OFFSET = 8
+# tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac, tp_net
+FRAME_HEADER = struct.Struct('=IIIIIIHH')
+
+
+def icmp_error_filter(types: Iterable[int] = ICMP_ERROR_TYPES, snaplen: int = 65535) -> List[Tuple[int, int, int, int]]:
+    """ICMP 오류 메시지만 통과시키는 classic BPF 프로그램
+
+    '(icmp and (icmp[0]=3 or icmp[0]=4 or ...))' 와 같은 필터를 libpcap 없이 한 번만 만들어 둔다.
+    SOCK_DGRAM 패킷 소켓에 붙이므로 오프셋 0 이 IP 헤더 시작이고 링크 종류와 관계없이 쓸 수 있다.
+    """
+    types = sorted(set(types))
+    # 점프 오프셋은 다음 명령 기준이므로 통과/버림 명령의 위치를 먼저 정함
+    accept = 6 + len(types)
+    drop = accept + 1
+    program = [
+        (BPF_LD_B_ABS, 0, 0, 9),                  # ip proto
+        (BPF_JEQ_K, 0, drop - 2, socket.IPPROTO_ICMP),
+        (BPF_LD_H_ABS, 0, 0, 6),                  # 조각 오프셋이 0 이 아니면 ICMP 헤더가 없음
+        (BPF_JSET_K, drop - 4, 0, 0x1fff),
+        (BPF_LDX_B_MSH, 0, 0, 0),                 # x = IP 헤더 길이
+        (BPF_LD_B_IND, 0, 0, 0),                  # icmp[0]
+    ]
+    for index, icmp_type in enumerate(types):
+        pc = 6 + index
+        last = index == len(types) - 1
+        program.append((BPF_JEQ_K, accept - (pc + 1), drop - (pc + 1) if last else 0, icmp_type))
+    program.append((BPF_RET_K, 0, 0, snaplen))
+    program.append((BPF_RET_K, 0, 0, 0))
+    return program
+
+
+def attach_filter(sock: socket.socket, program: List[Tuple[int, int, int, int]]):
+    """SO_ATTACH_FILTER 로 미리 만든 BPF 프로그램을 소켓에 연결 (struct sock_fprog 는 ctypes 버퍼로 전달)"""
+    code = b''.join(struct.pack('=HBBI', *instruction) for instruction in program)
+    buf = ctypes.create_string_buffer(code, len(code))
+    fprog = struct.pack('HP', len(program), ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def default_interface() -> str:
+    """기본 경로의 인터페이스 (/proc/net/route)"""
+    with open('/proc/net/route') as f:
+        for line in f.readlines()[1:]:
+            fields = line.split()
+            if fields[1] == '00000000':
+                return fields[0]
+    return 'lo'
+
+
+class RingCapture:
+    """인터페이스 하나에 TPACKET_V3 수신 링을 한 번 열고 블록 단위로 프레임을 넘기는 캡처 백엔드
+
+    커널은 블록(block_size) 이 차거나 retire_ms 가 지나면 블록을 사용자에게 넘기고,
+    blocks() 는 블록마다 (수신 시각, IP 헤더부터의 memoryview) 목록을 yield 한 뒤 블록을 커널에 돌려준다.
+    memoryview 는 링 메모리를 직접 가리키므로 다음 블록을 요청하기 전에 파싱을 끝내야 한다.
+    다른 스레드가 blocks() 를 읽고 있으면 stop() 후 그 스레드가 끝난 다음에 close() 한다.
+    """
+
+    def __init__(self, interface: str, program: Optional[List[Tuple[int, int, int, int]]] = None,
+                 block_size: int = 1 << 20, block_count: int = 64, frame_size: int = 2048, retire_ms: int = 10):
+        self.interface = interface
+        self.block_size = block_size
+        self.block_count = block_count
+        self.packets = 0
+        self.drops = 0
+        self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(ETH_P_IP))
+        try:
+            # 링을 만들기 전에 필터를 붙여야 필터 없이 들어온 패킷이 링에 남지 않음
+            attach_filter(self._sock, program or icmp_error_filter())
+            self._sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            req = struct.pack('=7I', block_size, block_count, frame_size, block_size * block_count // frame_size,
+                              retire_ms, 0, 0)
+            self._sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self._ring = mmap.mmap(self._sock.fileno(), block_size * block_count,
+                                   mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            self._sock.bind((interface, ETH_P_IP))
+        except OSError:
+            self._sock.close()
+            raise
+        self._view = memoryview(self._ring)
+        self._poll = select.poll()
+        self._poll.register(self._sock.fileno(), select.POLLIN | select.POLLERR)
+        self._block = 0
+        self._stopped = False
+        self._closed = False
+        logger.info(f"캡처 링 열기: {interface} ({block_count} x {block_size // 1024}KB 블록)")
+
+    def blocks(self, timeout: float = 0.2) -> Iterator[List[Tuple[float, memoryview]]]:
+        """사용자에게 넘어온 블록마다 [(수신 시각, 프레임), ...] 를 yield (stop() 후 timeout 안에 종료)"""
+        while not self._stopped:
+            offset = self._block * self.block_size
+            status, num_pkts, first = BLOCK_HEADER.unpack_from(self._view, offset + BLOCK_STATUS_OFFSET)
+            if not status & TP_STATUS_USER:
+                self._poll.poll(timeout * 1000)
+                continue
+            frames = []
+            frame = offset + first
+            for _ in range(num_pkts):
+                next_offset, sec, nsec, snaplen, _, _, _, net = FRAME_HEADER.unpack_from(self._view, frame)
+                frames.append((sec + nsec * 1e-9, self._view[frame + net:frame + net + snaplen]))
+                frame += next_offset
+            try:
+                yield frames
+            finally:
+                # 블록을 커널에 돌려주고 다음 블록으로 이동
+                if self._closed:
+                    return
+                struct.pack_into('=I', self._view, offset + BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+                self._block = (self._block + 1) % self.block_count
+
+    def stop(self):
+        self._stopped = True
+
+    def stats(self) -> Tuple[int, int]:
+        """지금까지 커널이 받은 패킷 수와 링이 가득 차서 버린 패킷 수 (PACKET_STATISTICS 는 읽으면 초기화됨)"""
+        if not self._closed:
+            packets, drops, _ = struct.unpack('=III', self._sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12))
+            self.packets += packets
+            self.drops += drops
+        return self.packets, self.drops
+
+    def close(self):
+        if self._closed:
+            return
+        packets, drops = self.stats()
+        self._stopped = self._closed = True
+        logger.info(f"캡처 링 닫기: {self.interface} (수신 {packets}개, 링 부족으로 버림 {drops}개)")
+        try:
+            self._view.release()
+            self._ring.close()
+        except BufferError:
+            # 호출한 쪽이 아직 프레임 memoryview 를 들고 있으면 GC 에 맡김
+            pass
+        self._sock.close()
@@ -41,11 +41,12 @@ class Sniffer(threading.Thread):
         self.lock = 0
         self.ecnon = 0
         self.flags = 0
+        self.ready = threading.Event()
         print('[**] init sniffer destip: ',destip, ' flags = ', self.flags, 'seq: ', self.seq, ' ack = ', self.ack, ' lock = ', self.lock, ' ecnon = ', self.ecnon)
 
     def run(self):
         try:
-            sniff(iface=self.interface, filter="tcp port 80", prn=self.print_packet, store=0)
+            sniff(iface=self.interface, filter="tcp port 80", prn=self.print_packet, store=0, started_callback=self.ready.set)
         finally: 
             print('ended') 
 
@@ -70,7 +71,7 @@ class Sniffer(threading.Thread):
                 if packet[TCP].options:
                     print("TCP Options:", packet[TCP].options)
 
-            ecn_bits = packet[IP].tos & 0xf
+            ecn_bits = packet[IP].tos & 0x3
             tmp_flag = str(packet[TCP].flags)
             print("\nECN Details:")
             print(f"ECN Bits: {ecn_bits}")
@@ -116,7 +117,8 @@ def run_one_ecn(domain_name):
         print("[*] Start sniffing... with ", domain_name)
         sniffer.start()
 
-        time.sleep(2)
+        # wait until the capture socket is open instead of a fixed sleep
+        sniffer.ready.wait(2)
 
         syn = IP(dst=domain_name) / TCP(dport=dport, flags='SEC', seq=seqnum, options=[('MSS',1460)])
         syn_ack = sr1(syn, verbose=False, timeout=2)
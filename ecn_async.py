@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import asyncio
+import random
+import time
+import argparse
+import logging
+from typing import List
+from scapy.all import TCP
+from ecn_batch import (BatchECNProber, ECNTarget, ECNProbeResult, build_request, classify, load_targets,
+                       parse_port_range, parse_families, parse_ports, read_filelist)
+from ecn_sniffer import FlowState, ip_header
+from ecn_portpool import DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH
+from ecn_sources import ProbeSource, parse_source
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFlow:
+    """FlowState 의 스니퍼 스레드 이벤트를 asyncio 이벤트로 옮겨주는 래퍼"""
+
+    def __init__(self, flow: FlowState, loop: asyncio.AbstractEventLoop):
+        self.flow = flow
+        self.events = {
+            'synack': asyncio.Event(),
+            'data': asyncio.Event(),
+            'fin': asyncio.Event(),
+        }
+        flow.listener = lambda kind: loop.call_soon_threadsafe(self.events[kind].set)
+
+    async def wait(self, kind: str, timeout: float) -> bool:
+        """흐름별 타이머: timeout 안에 이벤트가 발생하면 True"""
+        if self.events[kind].is_set():
+            return True
+        try:
+            await asyncio.wait_for(self.events[kind].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class AsyncECNEngine(BatchECNProber):
+    """asyncio 기반 ECN 협상 엔진 - 수천 개의 핸드셰이크를 동시에 진행"""
+
+    def __init__(self, max_inflight: int = 1000, rate: float = 200.0, **kwargs):
+        # rate: 출발지별 초당 새 핸드셰이크 수 (--source 의 /RATE 가 있으면 그 값)
+        super().__init__(rate=rate, **kwargs)
+        self.max_inflight = max_inflight
+
+    async def _pace(self, source: ProbeSource):
+        """출발지별 초당 rate 개 이하로 새 핸드셰이크 시작"""
+        delay = source.budget.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def probe_async(self, target: ECNTarget, dport: int) -> ECNProbeResult:
+        """SYN(ECE|CWR) -> ACK -> GET -> FIN 상태 머신을 비동기로 수행"""
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+
+        ip_addr = target.ip or await loop.run_in_executor(None, self._resolve, target)
+        if not ip_addr:
+            return self._make_result(target, 'N/A', dport, 'Error', None, 0, start_time, 'resolve failed')
+
+        source = self._next_source(ip_addr, target.source)
+        if source is None:
+            return self._make_result(target, ip_addr, dport, 'Error', None, 0, start_time, 'no source for family')
+        await self._pace(source)
+        # 이벤트 루프를 막지 않도록 포트 풀이 비어 있으면 비동기로 대기
+        sport = self.port_pool.acquire(timeout=0)
+        while sport is None:
+            await asyncio.sleep(0.01)
+            sport = self.port_pool.acquire(timeout=0)
+        flow = self._register_flow(source, ip_addr, dport, sport)
+        aflow = AsyncFlow(flow, loop)
+        sport = flow.key[2]
+        src = source.address
+        try:
+            seqnum = random.randint(1, 4294967295)
+            flow.syn_time = time.monotonic()
+            self._send(source, ip_header(ip_addr, src=src) / TCP(sport=sport, dport=dport, flags=self._syn_flags(),
+                                                                 seq=seqnum, options=[('MSS', 1460)]))
+            if not await aflow.wait('synack', self.timeout):
+                return self._make_result(target, ip_addr, dport, 'Error', flow, sport, start_time, 'no SYN-ACK')
+
+            synack = flow.synack[TCP]
+            my_seq = synack.ack
+            my_ack = (synack.seq + 1) & 0xffffffff
+
+            # ACK 와 GET 은 ECT(0) 로 전송하여 서버 응답의 ECT(0) 여부 확인
+            ect0 = ip_header(ip_addr, ecn=2, src=src)
+            self._send(source, ect0 / TCP(dport=dport, sport=sport, seq=my_seq, ack=my_ack,
+                                          flags=self._tcp_flags(flow, 'A', handshake=True)))
+            payload = build_request(target.domain, dport)
+            self._send(source, ect0 / TCP(dport=dport, sport=sport, seq=my_seq, ack=my_ack,
+                                          flags=self._tcp_flags(flow, 'PA')) / payload)
+            my_seq = (my_seq + len(payload)) & 0xffffffff
+
+            await aflow.wait('data', self._data_timeout(flow))
+
+            pkt = ip_header(ip_addr, src=src)
+            if self.event_driven:
+                # 첫 데이터의 ECN 비트로 결과가 정해졌으므로 RST 로 바로 종료
+                self._send(source, pkt / TCP(sport=sport, dport=dport, flags=self._tcp_flags(flow, 'RA'),
+                                             seq=my_seq, ack=flow.next_ack or my_ack))
+            else:
+                self._send(source, pkt / TCP(sport=sport, dport=dport, flags=self._tcp_flags(flow, 'FA'),
+                                             seq=my_seq, ack=flow.next_ack or my_ack))
+                if await aflow.wait('fin', self.timeout):
+                    self._send(source, pkt / TCP(sport=sport, dport=dport, flags=self._tcp_flags(flow, 'A'),
+                                                 seq=(my_seq + 1) & 0xffffffff, ack=flow.next_ack))
+
+            outcome = classify(flow.flags, flow.ecnon)
+            return self._make_result(target, ip_addr, dport, outcome, flow, sport, start_time)
+        except Exception as e:
+            logger.debug(f"측정 중 오류 {target.domain} ({ip_addr}): {e}")
+            return self._make_result(target, ip_addr, dport, 'Error', flow, sport, start_time, str(e))
+        finally:
+            flow.listener = None
+            self._release_flow(flow)
+
+    async def run_async(self, targets: List[ECNTarget]) -> List[ECNProbeResult]:
+        """동시 진행 수를 max_inflight 로 제한하며 모든 대상 측정"""
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        results = []
+
+        jobs = self._prepare_jobs(targets, results)
+
+        async def worker(target: ECNTarget, dport: int):
+            attempts = []
+            while True:
+                async with semaphore:
+                    attempts.append(await self.probe_async(target, dport))
+                if not self._should_retry(attempts):
+                    break
+                # 백오프 동안 동시 진행 슬롯을 다른 대상에 양보
+                await asyncio.sleep(self._retry_delay(len(attempts)))
+            self._emit(self._final_result(attempts), results)
+            if len(results) % 1000 == 0:
+                logger.info(f"진행: {len(results)}/{len(jobs)}")
+
+        await asyncio.gather(*(worker(target, dport) for target, dport in jobs))
+        return results
+
+    def run(self, targets: List[ECNTarget]) -> List[ECNProbeResult]:
+        logger.info(f"비동기 ECN 측정 시작: {len(targets)}개 대상, 동시 진행 {self.max_inflight}개, "
+                    f"초당 {self.rate}개")
+        self._start_capture()
+        start_time = time.time()
+        try:
+            results = asyncio.run(self.run_async(targets))
+        finally:
+            self._stop_capture()
+            self._flush_outputs()
+        elapsed = time.time() - start_time
+        self._print_statistics(results, elapsed)
+        return results
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description='asyncio 기반 ECN 서버 측정 엔진')
+    parser.add_argument('target_lists', nargs='*', help='대상 리스트 파일 경로 (rank,domain[,ip])')
+    parser.add_argument('--filelist', help='대상 리스트 파일 목록 (예: filelist_server.txt)')
+    parser.add_argument('--inflight', type=int, default=1000, help='동시 진행 핸드셰이크 수 (기본값: 1000)')
+    parser.add_argument('--rate', type=float, default=200.0,
+                        help='출발지별 초당 새 핸드셰이크 수, 0 은 무제한 (기본값: 200)')
+    parser.add_argument('--timeout', type=float, default=2.0, help='SYN-ACK/FIN 타임아웃 (기본값: 2초)')
+    parser.add_argument('--data-wait', type=float, default=1.0, help='GET 이후 데이터 대기 시간 (기본값: 1초)')
+    parser.add_argument('--event-driven', action='store_true',
+                        help='첫 데이터 세그먼트에서 결과 확정 후 RST 로 종료 (고정 대기 없음)')
+    parser.add_argument('--accecn', action='store_true',
+                        help='SYN 에 AE 도 설정하여 고전 ECN / AccECN / 미지원을 한 번에 구분')
+    parser.add_argument('--ports', type=parse_ports, default=[80],
+                        help='대상별 포트 목록이 없을 때 측정할 포트, 예: 80,443 (기본값: 80)')
+    parser.add_argument('--family', type=parse_families, default=[4],
+                        help='IP 가 없는 대상의 DNS 조회 주소족: 4, 6, both (기본값: 4, 리스트의 IPv6 주소는 항상 IPv6 로 측정)')
+    parser.add_argument('--port-range', type=parse_port_range, default=(DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH),
+                        help=f'측정 전용 출발지 포트 범위 (기본값: {DEFAULT_PORT_LOW}-{DEFAULT_PORT_HIGH})')
+    parser.add_argument('--segment', action='store_true', help='텍스트 결과와 함께 바이너리 세그먼트 파일 기록')
+    parser.add_argument('--journal', default=None,
+                        help='캠페인 저널 파일: 완료된 (대상, 포트)를 기록하고 재시작 시 건너뜀')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='Error/SAE-notECN 결과의 최대 재측정 횟수, 최종 라벨은 다수결 (기본값: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=1.0, help='첫 재측정 전 대기 시간, 이후 2배씩 증가 (기본값: 1초)')
+    parser.add_argument('--no-group', action='store_true',
+                        help='같은 (ip, port) 의 도메인도 각각 측정 (기본값: 한 번 측정 후 결과 복사)')
+    parser.add_argument('--group-sni', action='store_true', help='443 은 SNI(도메인)별로 따로 측정')
+    parser.add_argument('--source', type=parse_source, action='append', default=None,
+                        help='측정 출발지 ADDR[@IFACE][/RATE], 여러 번 지정하면 대상을 번갈아 배분 (예: 203.0.113.5@eth1/300)')
+    parser.add_argument('--no-rst-rule', action='store_true', help='커널 RST 차단 iptables 규칙을 설치하지 않음')
+    parser.add_argument('--cache', default=None,
+                        help='신선도 캐시 sqlite 파일: --cache-max-age 이내에 측정한 (ip, port)는 다시 측정하지 않음')
+    parser.add_argument('--cache-max-age', type=float, default=24.0, help='캐시 결과의 최대 유효 시간 (시간, 기본값: 24)')
+    parser.add_argument('--www', action='store_true', help='도메인 앞에 www. 추가 (ecn_www.py 동작)')
+    parser.add_argument('--iface', default=None, help='캡처 인터페이스 (기본값: scapy conf.iface)')
+    parser.add_argument('--my-ip', default=None, help='내 공인 IP (지정 시 api.ipify.org 조회 생략)')
+    parser.add_argument('--output-dir', default='ecnserver', help='출력 디렉토리 (기본값: ecnserver)')
+
+    args = parser.parse_args()
+
+    list_files = list(args.target_lists)
+    if args.filelist:
+        list_files.extend(read_filelist(args.filelist))
+    if not list_files:
+        parser.error('대상 리스트 파일 또는 --filelist 를 지정하세요')
+
+    engine = AsyncECNEngine(
+        max_inflight=args.inflight,
+        rate=args.rate,
+        timeout=args.timeout,
+        data_wait=args.data_wait,
+        ports=args.ports,
+        output_dir=args.output_dir,
+        interface=args.iface,
+        my_ip=args.my_ip,
+        event_driven=args.event_driven,
+        port_range=args.port_range,
+        suppress_rst=not args.no_rst_rule,
+        segment=args.segment,
+        journal=args.journal,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        families=args.family,
+        group_targets=not args.no_group,
+        group_sni=args.group_sni,
+        cache=args.cache,
+        cache_max_age=args.cache_max_age * 3600,
+        accecn=args.accecn,
+        sources=args.source
+    )
+
+    try:
+        targets = load_targets(list_files, add_www=args.www)
+        start_time = time.time()
+        results = engine.run(targets)
+        engine.save_results(results, time.time() - start_time)
+    except KeyboardInterrupt:
+        logger.info("사용자에 의해 중단되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
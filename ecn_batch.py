@@ -0,0 +1,928 @@
+#!/usr/bin/env python3
+import socket
+import struct
+import random
+import heapq
+import itertools
+import threading
+import time
+import zlib
+import os
+import sys
+import argparse
+import json
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, asdict, field, replace
+from typing import List, Dict, Optional, Iterable, Tuple
+from requests import get
+from scapy.all import IPv6, TCP, conf
+from tqdm import tqdm
+from ecn_sniffer import FlowState, ace_negotiation, canonical_ip, get_demux_sniffer, ip_header, ip_version
+from ecn_portpool import SourcePortPool, RSTSuppressor, DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH
+from ecn_writer import OutcomeWriter
+from ecn_journal import CampaignJournal
+from ecn_cache import DEFAULT_MAX_AGE, ProbeCache, cached_at
+from ecn_sources import ProbeSource, RateBudget, parse_source
+
+# 로깅 설정
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('ecn_batch.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# ecn.py 와 동일한 결과 라벨
+RESULT_LABELS = ['SAE-ECN', 'SAE-notECN', 'notSAE-notECN', 'Error']
+INVALID_VALUES = ["", "N/A", "NULL", "NONE", "UNDEFINED"]
+# 일시적 오류나 경로 잡음일 수 있어 재측정하는 라벨
+RETRY_OUTCOMES = ['Error', 'SAE-notECN']
+# 재측정 결과 투표에서 동수일 때의 우선순위 (ECT(0) 를 한 번이라도 받았으면 경로가 ECN 을 통과시킨 것)
+OUTCOME_PRECEDENCE = ['SAE-ECN', 'SAE-notECN', 'notSAE-notECN']
+
+
+def build_client_hello(server_name: str) -> bytes:
+    """443 포트 측정용 TLS ClientHello (SNI 포함) - 서버가 ServerHello/인증서를 보내도록 유도"""
+    sni = server_name.encode('ascii', 'ignore')
+    ext_sni = struct.pack('!HHHBH', 0x0000, len(sni) + 5, len(sni) + 3, 0, len(sni)) + sni
+    ext_groups = struct.pack('!HHHHH', 0x000a, 6, 4, 0x001d, 0x0017)
+    ext_points = struct.pack('!HHBB', 0x000b, 2, 1, 0)
+    ext_sigalgs = struct.pack('!HHHHHH', 0x000d, 8, 6, 0x0403, 0x0804, 0x0401)
+    extensions = ext_sni + ext_groups + ext_points + ext_sigalgs
+    ciphers = [0xc02f, 0xc02b, 0xc030, 0xc02c, 0x009c, 0x009d, 0x002f, 0x0035]
+    body = (struct.pack('!H', 0x0303) + os.urandom(32) + b'\x00'
+            + struct.pack('!H', 2 * len(ciphers)) + struct.pack(f'!{len(ciphers)}H', *ciphers)
+            + b'\x01\x00' + struct.pack('!H', len(extensions)) + extensions)
+    handshake = b'\x01' + struct.pack('!I', len(body))[1:] + body
+    return b'\x16\x03\x01' + struct.pack('!H', len(handshake)) + handshake
+
+
+def build_request(domain: str, dport: int) -> bytes:
+    """포트에 맞는 첫 요청: 443 은 TLS ClientHello, 그 외는 ecn.py 와 같은 HTTP GET"""
+    if dport == 443:
+        return build_client_hello(domain)
+    getStr = 'GET / HTTP/1.1\r\nHost:' + domain + '\r\nAccept-Encoding: gzip, deflate\r\n\r\n'
+    return getStr.encode()
+
+
+def parse_ports(value: str, sep: str = ',') -> List[int]:
+    """'80,443' 형식의 포트 목록 파싱"""
+    return [int(port) for port in value.split(sep) if port.strip()]
+
+
+# IP TOS 하위 2비트 값 순서의 ECN 코드포인트 이름
+ECN_CODEPOINTS = ['Not-ECT', 'ECT(1)', 'ECT(0)', 'CE']
+
+
+# AccECN (RFC 9768): SYN-ACK 의 ACE -> 서버가 받은 SYN 의 ECN 코드포인트
+SYN_ECN_FEEDBACK = {0b010: 'Not-ECT', 0b011: 'ECT(1)', 0b100: 'ECT(0)', 0b110: 'CE'}
+# 핸드셰이크 마지막 ACK 의 ACE: 받은 SYN-ACK 의 ECN 코드포인트 (ECN_CODEPOINTS 순서) 피드백
+SYNACK_ECN_FEEDBACK = [0b010, 0b011, 0b100, 0b110]
+# 이후 세그먼트의 ACE 는 받은 CE 패킷 수 카운터 (초기값 5)
+ACCECN_CEP_INIT = 5
+TCP_FLAG_BITS = {'A': 0x10, 'PA': 0x18, 'FA': 0x11, 'RA': 0x14}
+
+
+def ecn_verdict(counts: List[int]) -> str:
+    """응답 데이터 세그먼트 전체의 코드포인트 수로 경로 판정
+
+    intact: 모두 ECT(0), bleached: 모두 Not-ECT, partial-bleaching: ECT(0)/Not-ECT 혼재,
+    remarked-ECT1: ECT(1) 로 변경됨, CE-marked: 혼잡 표시 수신, no-data: 데이터 없음
+    """
+    not_ect, ect1, ect0, ce = counts
+    total = sum(counts)
+    if total == 0:
+        return 'no-data'
+    if ce:
+        return 'CE-marked'
+    if ect1:
+        return 'remarked-ECT1'
+    if ect0 == total:
+        return 'intact'
+    if not_ect == total:
+        return 'bleached'
+    return 'partial-bleaching'
+
+
+def vote_outcome(outcomes: List[str]) -> str:
+    """여러 번 측정한 라벨 중 Error 를 제외한 다수결, 동수이면 OUTCOME_PRECEDENCE 순서"""
+    valid = [o for o in outcomes if o in OUTCOME_PRECEDENCE]
+    if not valid:
+        return 'Error'
+    return max(OUTCOME_PRECEDENCE, key=lambda o: (valid.count(o), -OUTCOME_PRECEDENCE.index(o)))
+
+
+def classify(flags: int, ecnon: int) -> str:
+    """Sniffer 상태값(flags, ecnon)을 ecn.py 와 같은 결과 라벨로 변환"""
+    if ecnon == 1 and flags == 1:
+        return 'SAE-ECN'
+    elif ecnon == 0 and flags == 1:
+        return 'SAE-notECN'
+    elif ecnon == 0 and flags == 0:
+        return 'notSAE-notECN'
+    return 'Error'
+
+
+@dataclass
+class ECNTarget:
+    """ECN 서버 측정 대상"""
+    rank: str
+    domain: str
+    ip: str
+    ports: List[int] = field(default_factory=list)  # 비어 있으면 측정기의 기본 포트 목록 사용
+    family: int = 0  # DNS 조회할 주소족 (4/6), 0 이면 ip 의 주소족 또는 측정기 기본값
+    source: str = ''  # 측정할 출발지 주소 (캐시를 쓰면 작업 준비 시 배정, 비어 있으면 측정 시 번갈아 선택)
+
+
+@dataclass
+class ECNProbeResult:
+    """ECN 서버 측정 결과를 저장하는 데이터 클래스"""
+    rank: str
+    domain: str
+    ip: str
+    outcome: str
+    flags: int
+    ecnon: int
+    sport: int
+    dport: int
+    response_time: float
+    timestamp: str
+    error: str = ''
+    screen: str = ''  # 2단계 캠페인의 SYN 스크린 결과 (SAE/notSAE/RST/none)
+    # [Not-ECT, ECT(1), ECT(0), CE], 코드포인트를 관찰할 수 없는 측정(커널 스택)은 빈 목록
+    ecn_counts: List[int] = field(default_factory=lambda: [0, 0, 0, 0])
+    ecn_verdict: str = ''
+    attempt_outcomes: List[str] = field(default_factory=list)  # 재측정 시 시도별 라벨
+    family: int = 4  # 측정한 주소족 (4/6)
+    shared_from: str = ''  # 같은 (ip, port) 를 대표로 측정한 도메인 (그 결과를 복사한 경우)
+    cached_at: str = ''  # 신선도 캐시에서 가져온 결과의 원래 측정 시각 (새로 측정했으면 빈 값)
+    negotiation: str = ''  # accecn 측정 시 SYN-ACK ACE 판정 (AccECN/ECN/notECN/broken)
+    syn_ecn_feedback: str = ''  # AccECN 서버가 받은 SYN 의 ECN 코드포인트
+    source: str = ''  # 측정에 사용한 출발지 주소
+
+
+def load_targets(list_files: Iterable[str], add_www: bool = False) -> List[ECNTarget]:
+    """대상 리스트 파일을 읽어 ECNTarget 목록 생성
+
+    지원 형식: 'domain', 'rank,domain', 'rank,domain,ip', 'rank,domain,ip,80;443'
+    (ip 가 N/A 이면 DNS 조회, 포트 목록이 없으면 측정기의 기본 포트 사용, ip 는 IPv4/IPv6 모두 가능)
+    """
+    targets = []
+    for list_file in list_files:
+        try:
+            with open(list_file, "r") as f:
+                lines = [line.strip().split(',') for line in f if line.strip()]
+        except Exception as e:
+            logger.error(f"대상 리스트 파일 읽기 실패 {list_file}: {e}")
+            continue
+
+        for item in lines:
+            if item[0] in ('Number', 'rank'):
+                continue
+            if len(item) == 1:
+                rank, domain, ip_addr = '', item[0], ''
+            elif len(item) == 2:
+                rank, domain, ip_addr = item[0], item[1], ''
+            else:
+                rank, domain, ip_addr = item[0], item[1], item[2]
+
+            domain = domain.strip()
+            if add_www and domain.find('www.') < 0:
+                domain = 'www.' + domain
+            ip_addr = ip_addr.strip()
+            if ip_addr.upper() in INVALID_VALUES or not ip_version(ip_addr):
+                ip_addr = ''
+            else:
+                # 스니퍼가 캡처한 패킷의 src 와 같은 표기로 맞춤
+                ip_addr = canonical_ip(ip_addr)
+            ports = parse_ports(item[3], ';') if len(item) >= 4 else []
+            targets.append(ECNTarget(rank=rank, domain=domain, ip=ip_addr, ports=ports,
+                                     family=ip_version(ip_addr) if ip_addr else 0))
+        logger.info(f"{list_file}: 누적 {len(targets)}개의 대상 로드 완료")
+    return targets
+
+
+class BatchECNProber:
+    """하나의 프로세스에서 여러 ECN 서버 측정을 동시에 수행하는 클래스"""
+
+    # 신선도 캐시에 기록하는 측정 종류
+    probe_type = 'ecn'
+
+    def __init__(self, max_workers: int = 32, timeout: float = 2.0, data_wait: float = 1.0,
+                 ports: Iterable[int] = (80,), output_dir: str = 'ecnserver', interface: Optional[str] = None,
+                 my_ip: Optional[str] = None, event_driven: bool = False, rtt_factor: float = 4.0,
+                 min_data_wait: float = 0.2, port_range: Tuple[int, int] = (DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH),
+                 suppress_rst: bool = True, segment: bool = False, flush_records: int = 1000,
+                 flush_interval: float = 1.0, journal: Optional[str] = None, retries: int = 0,
+                 retry_backoff: float = 1.0, families: Iterable[int] = (4,), group_targets: bool = True,
+                 group_sni: bool = False, cache: Optional[str] = None, cache_max_age: float = DEFAULT_MAX_AGE,
+                 accecn: bool = False, sources: Optional[Iterable[ProbeSource]] = None, rate: float = 0.0,
+                 resolve_workers: int = 64):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.data_wait = data_wait
+        # event_driven: 첫 데이터 세그먼트에서 결과 확정, RST 로 즉시 종료, 대기 시간은 RTT 기반
+        self.event_driven = event_driven
+        self.rtt_factor = rtt_factor
+        self.min_data_wait = min_data_wait
+        self.ports = list(ports)
+        # accecn: SYN 에 AE 도 설정하여 한 번의 핸드셰이크로 고전 ECN / AccECN / 미지원을 구분
+        self.accecn = accecn
+        if accecn:
+            self.probe_type = self.probe_type + '-accecn'
+        # IP 가 없는 대상을 조회할 주소족 (4, 6 또는 둘 다 - 둘 다이면 대상마다 두 작업)
+        self.families = list(families)
+        # IP 가 없는 대상을 측정 전에 동시에 DNS 조회할 스레드 수
+        self.resolve_workers = resolve_workers
+        # RETRY_OUTCOMES 로 끝난 작업은 최대 retries 번 지수 백오프 후 재측정하고 투표로 최종 라벨 결정
+        self.max_attempts = 1 + max(0, retries)
+        self.retry_backoff = retry_backoff
+        # group_targets: 같은 (ip, port) 의 도메인들은 한 번만 측정하고 결과를 도메인별로 복사
+        # group_sni: 443 은 SNI 마다 따로 측정 (SNI 에 따라 응답이 달라지는 서버)
+        self.group_targets = group_targets
+        self.group_sni = group_sni
+        # 대표 작업 (domain, ip, port) -> 같은 그룹의 나머지 대상
+        self._fanout: Dict[Tuple[str, str, int], List[ECNTarget]] = {}
+        self.output_dir = output_dir
+        self.interface = interface or conf.iface
+        self.my_ip = my_ip or self._get_my_ip()
+        # 측정 출발지 (주소/인터페이스별 캡처 소켓, 송신 소켓, 초당 rate 예산), 작업마다 번갈아 사용
+        # 지정하지 않으면 커널 라우팅이 출발지 주소를 정하는 기본 출발지 하나
+        self.rate = rate
+        self.sources = list(sources) if sources else [ProbeSource()]
+        for source in self.sources:
+            source.interface = source.interface or self.interface
+            source.budget = RateBudget(source.rate or rate)
+        self._source_cycle = itertools.cycle(self.sources)
+        self._source_by_address = {source.address: source for source in self.sources}
+        self._socket_lock = threading.Lock()
+        # 전용 출발지 포트 범위: 흐름마다 할당/반납하고 해당 범위의 커널 RST 를 차단
+        self.port_pool = SourcePortPool(*port_range)
+        self.rst_suppressors = []
+        if suppress_rst:
+            self.rst_suppressors = [RSTSuppressor(*port_range, command=command)
+                                    for command in ('iptables', 'ip6tables')]
+        if self.max_workers > len(self.port_pool):
+            logger.warning(f"워커 수({self.max_workers})가 포트 풀 크기({len(self.port_pool)})보다 큽니다")
+
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        self.result_file_name = os.path.join(self.output_dir, 'result_' + str(self.my_ip) + '.txt')
+        self.revise_file_name = os.path.join(self.output_dir, 'revise_' + str(self.my_ip) + '.txt')
+        # 결과는 메모리에 모았다가 레코드 수/시간 기준으로 한 번에 기록 (segment: 바이너리 세그먼트 추가 기록)
+        segment_file = None
+        if segment:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            segment_file = os.path.join(self.output_dir, f"segment_{self.my_ip}_{timestamp}.bin")
+        # journal: 완료된 (대상, 포트)를 기록하여 재시작 시 건너뜀
+        self.journal = CampaignJournal(journal) if journal else None
+        self.writer = OutcomeWriter(max_records=flush_records, flush_interval=flush_interval,
+                                    segment_file=segment_file, sync=self.journal is not None)
+        # cache: cache_max_age 초 이내에 이 vantage 에서 측정한 (ip, port)는 다시 보내지 않음
+        self.cache = ProbeCache(cache, self.my_ip, cache_max_age) if cache else None
+
+    def _get_my_ip(self) -> str:
+        """내 IP 주소를 가져오는 함수 (프로세스당 한 번만 호출)"""
+        try:
+            logger.info("내 IP 주소를 확인하는 중...")
+            my_ip = get('https://api.ipify.org', timeout=10).text
+            logger.info(f"내 IP 주소: {my_ip}")
+            return my_ip
+        except Exception as e:
+            logger.error(f"IP 주소 확인 실패: {e}")
+            return "unknown"
+
+    def _resolve(self, target: ECNTarget) -> Optional[str]:
+        """대상 IP 주소 확인 (없으면 DNS 조회)"""
+        if target.ip:
+            return target.ip
+        family = socket.AF_INET6 if (target.family or self.families[0]) == 6 else socket.AF_INET
+        try:
+            infos = socket.getaddrinfo(target.domain, None, family, socket.SOCK_STREAM)
+            return canonical_ip(infos[0][4][0]) if infos else None
+        except socket.gaierror as e:
+            logger.debug(f"도메인 해석 실패 {target.domain}: {e}")
+            return None
+
+    def _resolve_jobs(self, jobs: List[Tuple[ECNTarget, int]]) -> List[Tuple[ECNTarget, int]]:
+        """IP 가 없는 대상은 측정을 시작하기 전에 스레드 풀로 DNS 조회하고 조회한 IP 를 채운 작업 목록 반환
+
+        이벤트 루프 안에서 getaddrinfo 를 기다리지 않도록 조회를 먼저 끝낸다.
+        조회에 실패한 대상은 IP 가 빈 채로 남아 측정 시 'resolve failed' 가 된다.
+        """
+        unresolved = list({id(target): target for target, _ in jobs if not target.ip}.values())
+        if not unresolved:
+            return jobs
+        logger.info(f"DNS 조회 대상: {len(unresolved)}개")
+        with ThreadPoolExecutor(max_workers=self.resolve_workers) as executor:
+            resolved = {id(target): replace(target, ip=ip_addr)
+                        for target, ip_addr in zip(unresolved, executor.map(self._resolve, unresolved)) if ip_addr}
+        logger.info(f"DNS 조회 완료: {len(resolved)}/{len(unresolved)}개")
+        return [(resolved.get(id(target), target), dport) for target, dport in jobs]
+
+    def _next_source(self, ip_addr: str, address: str = '') -> Optional[ProbeSource]:
+        """대상과 같은 주소족의 출발지를 번갈아 선택 (주소 없는 기본 출발지는 모든 주소족 가능)
+
+        address 가 있으면 작업 준비 시 배정한 그 출발지를 사용한다.
+        """
+        if address:
+            return self._source_by_address.get(address)
+        for _ in range(len(self.sources)):
+            source = next(self._source_cycle)
+            if not source.address or ip_version(source.address) == ip_version(ip_addr):
+                return source
+        return None
+
+    def _register_flow(self, source: ProbeSource, ip_addr: str, dport: int, sport: Optional[int] = None) -> FlowState:
+        """포트 풀에서 출발지 포트를 할당받아 출발지의 공유 스니퍼에 흐름 등록"""
+        if sport is None:
+            sport = self.port_pool.acquire()
+        try:
+            flow = source.sniffer.register(ip_addr, dport, sport)
+        except ValueError:
+            self.port_pool.release(sport)
+            raise
+        flow.accecn = self.accecn
+        flow.source = source
+        return flow
+
+    def _send(self, source: ProbeSource, packet):
+        """출발지 인터페이스의 주소족별 L3 소켓 하나를 측정 전체에서 재사용하여 전송"""
+        if IPv6 in packet:
+            if source.l3socket6 is None:
+                with self._socket_lock:
+                    if source.l3socket6 is None:
+                        source.l3socket6 = conf.L3socket6(iface=source.interface)
+            source.l3socket6.send(packet)
+        else:
+            if source.l3socket is None:
+                with self._socket_lock:
+                    if source.l3socket is None:
+                        source.l3socket = conf.L3socket(iface=source.interface)
+            source.l3socket.send(packet)
+
+    def _syn_flags(self) -> str:
+        """ECN 협상 SYN 플래그: ECE|CWR, accecn 이면 AE 추가"""
+        return 'SECN' if self.accecn else 'SEC'
+
+    def _tcp_flags(self, flow: FlowState, flags: str, handshake: bool = False):
+        """AccECN 이 협상된 흐름이면 flags 에 ACE 피드백을 더함 (그 외에는 flags 그대로)
+
+        handshake: 핸드셰이크 마지막 ACK (SYN-ACK 의 ECN 코드포인트), 그 외: CE 카운터
+        """
+        if not flow.accecn or ace_negotiation(flow.synack_ace) != 'AccECN':
+            return flags
+        if handshake:
+            ace = SYNACK_ECN_FEEDBACK[flow.synack_ecn]
+        else:
+            ace = (ACCECN_CEP_INIT + flow.ecn_counts[3]) & 0x7
+        return TCP_FLAG_BITS[flags] | (ace << 6)
+
+    def _release_flow(self, flow: FlowState):
+        flow.source.sniffer.unregister(flow)
+        self.port_pool.release(flow.key[2])
+
+    def _start_capture(self):
+        """출발지마다 포트 범위만 수신하는 공유 스니퍼 시작 및 RST 차단 규칙 설치"""
+        # 목적지 포트가 여러 개일 수 있으므로 로컬 포트 범위로만 거름 (출발지 주소가 있으면 그 주소로 온 것만)
+        bpf = f"tcp and dst portrange {self.port_pool.low}-{self.port_pool.high}"
+        for source in self.sources:
+            source_bpf = f"{bpf} and dst host {source.address}" if source.address else bpf
+            source.sniffer = get_demux_sniffer(source.interface, source_bpf)
+        if len(self.sources) > 1:
+            logger.info(f"출발지 {len(self.sources)}개: " +
+                        ", ".join(f"{s.name}@{s.interface} ({s.budget.rate or '무제한'}/s)" for s in self.sources))
+        for suppressor in self.rst_suppressors:
+            suppressor.install()
+
+    def _stop_capture(self):
+        for suppressor in self.rst_suppressors:
+            suppressor.remove()
+        for source in self.sources:
+            for sock in (source.l3socket, source.l3socket6):
+                if sock is not None:
+                    sock.close()
+            source.l3socket = source.l3socket6 = None
+
+    def _data_timeout(self, flow: FlowState) -> float:
+        """GET 이후 첫 데이터 대기 시간 (event_driven 이면 RTT 에 비례, data_wait 이하)"""
+        if not self.event_driven or not flow.rtt:
+            return self.data_wait
+        return min(self.data_wait, max(self.min_data_wait, self.rtt_factor * flow.rtt))
+
+    def _expand_families(self, targets: List[ECNTarget]) -> List[ECNTarget]:
+        """IP 가 없는 대상을 측정할 주소족마다 하나씩 복제 (IP 가 있으면 그 주소족 그대로)"""
+        expanded = []
+        for target in targets:
+            if target.ip or target.family:
+                expanded.append(target)
+            else:
+                expanded.extend(replace(target, family=family) for family in self.families)
+        return expanded
+
+    def _jobs(self, targets: List[ECNTarget]) -> List[Tuple[ECNTarget, int]]:
+        """(대상, 포트) 측정 작업 목록 - 같은 IP 의 포트들은 연속으로 배치되어 동시에 측정됨
+
+        저널이 있으면 이미 완료된 (대상, 포트)는 제외한다.
+        """
+        jobs = [(target, dport) for target in self._expand_families(targets)
+                for dport in (target.ports or self.ports)]
+        if self.journal is not None and len(self.journal):
+            total = len(jobs)
+            jobs = [(target, dport) for target, dport in jobs
+                    if not self.journal.done(target.domain, target.ip, dport, target.family)]
+            logger.info(f"저널에 따라 완료된 작업 {total - len(jobs)}개를 건너뜁니다")
+        return jobs
+
+    def _pinned_source(self, ip_addr: str) -> Optional[ProbeSource]:
+        """대상 IP 마다 항상 같은 출발지 (재실행에서도 같은 출발지로 측정하여 그 출발지의 캐시 결과를 사용)"""
+        eligible = [source for source in self.sources
+                    if not source.address or ip_version(source.address) == ip_version(ip_addr)]
+        return eligible[zlib.crc32(ip_addr.encode()) % len(eligible)] if eligible else None
+
+    def _cache_probe(self, address: str) -> str:
+        """신선도 캐시의 측정 종류: 출발지마다 경로가 다르므로 출발지 주소를 포함 (기본 출발지는 probe_type)"""
+        return f"{self.probe_type}@{address}" if address else self.probe_type
+
+    def _cached_jobs(self, jobs: List[Tuple[ECNTarget, int]],
+                     results: List[ECNProbeResult]) -> List[Tuple[ECNTarget, int]]:
+        """신선도 캐시에 있는 작업은 저장된 결과로 기록하고 나머지 작업만 반환
+
+        캐시는 출발지별로 조회하므로 각 대상에 측정할 출발지를 먼저 배정하고 남은 작업도 그 출발지로 측정한다.
+        """
+        if self.cache is None:
+            return jobs
+        remaining = []
+        pinned: Dict[int, ECNTarget] = {}
+        for target, dport in jobs:
+            entry = None
+            if target.ip:
+                if id(target) not in pinned:
+                    source = self._pinned_source(target.ip)
+                    pinned[id(target)] = replace(target, source=source.address) if source is not None else target
+                target = pinned[id(target)]
+                if self._next_source(target.ip, target.source) is not None:
+                    entry = self.cache.get(target.ip, dport, self._cache_probe(target.source))
+            if entry is None:
+                remaining.append((target, dport))
+                continue
+            outcome, data, measured = entry
+            result = ECNProbeResult(
+                rank=target.rank,
+                domain=target.domain,
+                ip=target.ip,
+                outcome=outcome,
+                flags=data.get('flags', 0),
+                ecnon=data.get('ecnon', 0),
+                sport=0,
+                dport=dport,
+                response_time=0.0,
+                timestamp=datetime.now().isoformat(),
+                ecn_counts=data.get('ecn_counts', [0, 0, 0, 0]),
+                ecn_verdict=data.get('ecn_verdict', ''),
+                family=target.family or ip_version(target.ip),
+                cached_at=cached_at(measured),
+                negotiation=data.get('negotiation', ''),
+                syn_ecn_feedback=data.get('syn_ecn_feedback', ''),
+                source=target.source or self.my_ip
+            )
+            self.write_result(result)
+            results.append(result)
+        if len(remaining) < len(jobs):
+            logger.info(f"캐시에서 가져온 결과 {len(jobs) - len(remaining)}개 (측정하지 않음)")
+        return remaining
+
+    def _prepare_jobs(self, targets: List[ECNTarget], results: List[ECNProbeResult]) -> List[Tuple[ECNTarget, int]]:
+        """저널로 끝난 작업을 제외하고 IP 없는 대상을 DNS 조회한 뒤 캐시에 없는 작업만 같은 (ip, port) 로 묶은 측정 작업 목록
+
+        캐시는 (ip, port) 로 조회하므로 도메인만 있는 대상도 조회한 IP 로 캐시 결과를 사용한다.
+        """
+        return self._group_jobs(self._cached_jobs(self._resolve_jobs(self._jobs(targets)), results))
+
+    def _group_key(self, target: ECNTarget, dport: int) -> Tuple[str, int, str]:
+        """묶음 측정 키: (ip, port), group_sni 이면 443 은 SNI(도메인)까지 포함"""
+        sni = target.domain if self.group_sni and dport == 443 else ''
+        return target.ip, dport, sni
+
+    def _group_jobs(self, jobs: List[Tuple[ECNTarget, int]]) -> List[Tuple[ECNTarget, int]]:
+        """같은 키의 작업 중 첫 번째만 측정 작업으로 남기고 나머지는 대표 결과를 복사할 대상으로 기록
+
+        IP 가 없는 대상은 미리 조회한 IP 로 묶고, 조회에 실패한 대상만 묶지 않는다.
+        """
+        if not self.group_targets:
+            return jobs
+        groups: Dict[Tuple[str, int, str], List[ECNTarget]] = {}
+        grouped = []
+        for target, dport in jobs:
+            if not target.ip:
+                grouped.append((target, dport))
+                continue
+            key = self._group_key(target, dport)
+            members = groups.get(key)
+            if members is None:
+                groups[key] = members = []
+                grouped.append((target, dport))
+            else:
+                members.append(target)
+        for target, dport in grouped:
+            members = groups.get(self._group_key(target, dport)) if target.ip else None
+            if members:
+                self._fanout[(target.domain, target.ip, dport)] = members
+        if len(grouped) < len(jobs):
+            logger.info(f"같은 (ip, port) 묶음 측정: {len(jobs)}개 작업 -> {len(grouped)}개 핸드셰이크")
+        return grouped
+
+    def _emit(self, result: ECNProbeResult, results: List[ECNProbeResult]):
+        """최종 결과와 같은 그룹의 나머지 도메인 결과를 기록하고 results 에 추가"""
+        records = [result]
+        for member in self._fanout.pop((result.domain, result.ip, result.dport), []):
+            records.append(replace(result, rank=member.rank, domain=member.domain, shared_from=result.domain,
+                                   ecn_counts=list(result.ecn_counts),
+                                   attempt_outcomes=list(result.attempt_outcomes)))
+        for record in records:
+            self.write_result(record)
+            results.append(record)
+        if self.cache is not None and result.outcome != 'Error' and result.ip != 'N/A':
+            # 기본 출발지의 결과는 source 가 내 공인 IP 이므로 출발지 주소 없이 기록
+            address = result.source if result.source in self._source_by_address else ''
+            self.cache.put(result.ip, result.dport, self._cache_probe(address), result.outcome,
+                           {'flags': result.flags, 'ecnon': result.ecnon, 'ecn_counts': result.ecn_counts,
+                            'ecn_verdict': result.ecn_verdict, 'negotiation': result.negotiation,
+                            'syn_ecn_feedback': result.syn_ecn_feedback})
+
+    def _flush_outputs(self):
+        """버퍼에 남은 결과를 기록하고 캐시를 commit"""
+        self.writer.close()
+        if self.cache is not None:
+            self.cache.commit()
+
+    def _make_result(self, target: ECNTarget, ip_addr: str, dport: int, outcome: str, flow: Optional[FlowState],
+                     sport: int, start_time: float, error: str = '') -> ECNProbeResult:
+        negotiation = syn_ecn_feedback = ''
+        # 흐름이 코드포인트 수를 갖지 못했으면 (ecn_counts 가 None) 경로 판정은 알 수 없음
+        counts = flow.ecn_counts if flow is not None else [0, 0, 0, 0]
+        if flow is not None and flow.accecn and flow.synack is not None:
+            negotiation = ace_negotiation(flow.synack_ace)
+            syn_ecn_feedback = SYN_ECN_FEEDBACK.get(flow.synack_ace, '') if negotiation == 'AccECN' else ''
+        return ECNProbeResult(
+            rank=target.rank,
+            domain=target.domain,
+            ip=ip_addr,
+            outcome=outcome,
+            flags=flow.flags if flow else 0,
+            ecnon=flow.ecnon if flow else 0,
+            sport=sport,
+            dport=dport,
+            response_time=time.time() - start_time,
+            timestamp=datetime.now().isoformat(),
+            error=error,
+            ecn_counts=list(counts) if counts is not None else [],
+            ecn_verdict=ecn_verdict(counts) if flow and flow.flags and counts is not None else '',
+            family=ip_version(ip_addr) or target.family or self.families[0],
+            negotiation=negotiation,
+            syn_ecn_feedback=syn_ecn_feedback,
+            source=self._source_tag(flow)
+        )
+
+    def _source_tag(self, flow) -> str:
+        """결과에 기록할 출발지 주소 (출발지를 지정하지 않았으면 내 공인 IP)"""
+        source = getattr(flow, 'source', None)
+        return (source.address if source is not None else '') or self.my_ip
+
+    def _should_retry(self, attempts: List[ECNProbeResult]) -> bool:
+        return len(attempts) < self.max_attempts and attempts[-1].outcome in RETRY_OUTCOMES
+
+    def _retry_delay(self, attempt: int) -> float:
+        """attempt 번째 시도 이후의 대기 시간 (지수 백오프 + 지터)"""
+        return self.retry_backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+    def _final_result(self, attempts: List[ECNProbeResult]) -> ECNProbeResult:
+        """시도들의 투표 라벨과 같은 마지막 시도를 최종 결과로 사용"""
+        if len(attempts) == 1:
+            return attempts[0]
+        outcomes = [r.outcome for r in attempts]
+        outcome = vote_outcome(outcomes)
+        result = next(r for r in reversed(attempts) if r.outcome == outcome)
+        result.attempt_outcomes = outcomes
+        return result
+
+    def probe(self, target: ECNTarget, dport: int) -> ECNProbeResult:
+        """단일 (대상, 포트)에 대해 SYN(ECE|CWR) -> ACK -> GET -> FIN 순서로 ECN 측정 수행"""
+        start_time = time.time()
+
+        ip_addr = self._resolve(target)
+        if not ip_addr:
+            return self._make_result(target, 'N/A', dport, 'Error', None, 0, start_time, 'resolve failed')
+
+        # 출발지의 전송 예산만큼 기다린 뒤 그 출발지 스니퍼의 흐름 테이블에 등록
+        source = self._next_source(ip_addr, target.source)
+        if source is None:
+            return self._make_result(target, ip_addr, dport, 'Error', None, 0, start_time, 'no source for family')
+        source.budget.wait()
+        flow = self._register_flow(source, ip_addr, dport)
+        sport = flow.key[2]
+        src = source.address
+        try:
+            seqnum = random.randint(1, 4294967295)
+            syn = ip_header(ip_addr, src=src) / TCP(sport=sport, dport=dport, flags=self._syn_flags(), seq=seqnum,
+                                                    options=[('MSS', 1460)])
+            flow.syn_time = time.monotonic()
+            self._send(source, syn)
+            if not flow.synack_event.wait(self.timeout):
+                return self._make_result(target, ip_addr, dport, 'Error', flow, sport, start_time, 'no SYN-ACK')
+
+            synack = flow.synack[TCP]
+            my_seq = synack.ack
+            my_ack = (synack.seq + 1) & 0xffffffff
+
+            ect0 = ip_header(ip_addr, ecn=2, src=src)
+            ACK = ect0 / TCP(dport=dport, sport=sport, seq=my_seq, ack=my_ack,
+                             flags=self._tcp_flags(flow, 'A', handshake=True))
+            self._send(source, ACK)
+            payload = build_request(target.domain, dport)
+            request = ect0 / TCP(dport=dport, sport=sport, seq=my_seq, ack=my_ack,
+                                 flags=self._tcp_flags(flow, 'PA')) / payload
+            self._send(source, request)
+            my_seq = (my_seq + len(payload)) & 0xffffffff
+
+            flow.data_event.wait(self._data_timeout(flow))
+
+            pkt = ip_header(ip_addr, src=src)
+            if self.event_driven:
+                # 첫 데이터의 ECN 비트로 결과가 정해졌으므로 RST 로 바로 종료
+                self._send(source, pkt / TCP(sport=sport, dport=dport, flags=self._tcp_flags(flow, 'RA'),
+                                             seq=my_seq, ack=flow.next_ack or my_ack))
+            else:
+                # 연결 종료 (FIN -> FIN/ACK -> ACK)
+                FIN = pkt / TCP(sport=sport, dport=dport, flags=self._tcp_flags(flow, 'FA'), seq=my_seq,
+                                ack=flow.next_ack or my_ack)
+                self._send(source, FIN)
+                if flow.fin_event.wait(self.timeout):
+                    LASTACK = pkt / TCP(sport=sport, dport=dport, flags=self._tcp_flags(flow, 'A'),
+                                        seq=(my_seq + 1) & 0xffffffff, ack=flow.next_ack)
+                    self._send(source, LASTACK)
+
+            outcome = classify(flow.flags, flow.ecnon)
+            return self._make_result(target, ip_addr, dport, outcome, flow, sport, start_time)
+        except Exception as e:
+            logger.debug(f"측정 중 오류 {target.domain} ({ip_addr}): {e}")
+            return self._make_result(target, ip_addr, dport, 'Error', flow, sport, start_time, str(e))
+        finally:
+            self._release_flow(flow)
+
+    def write_result(self, result: ECNProbeResult):
+        """ecn.py 와 같은 형식(label,ip,domain)으로 결과 기록 (80 이외 포트는 4번째 열에 포트 추가)"""
+        file_name = self.result_file_name if result.outcome == 'SAE-ECN' else self.revise_file_name
+        line = result.outcome + ',' + result.ip + ',' + result.domain
+        if result.dport != 80:
+            line += ',' + str(result.dport)
+        line += "\n"
+        journal = None
+        if self.journal is not None:
+            entry = self.journal.entry(result.domain, result.ip, result.dport, result.family)
+            journal = (self.journal.file_name, entry)
+        self.writer.write(file_name, line, result, journal)
+
+    def run(self, targets: List[ECNTarget]) -> List[ECNProbeResult]:
+        """메인 실행 함수 - 멀티스레드로 ECN 서버 측정 수행"""
+        results = []
+        jobs = self._prepare_jobs(targets, results)
+        logger.info(f"ECN 서버 측정 시작: {len(targets)}개 대상, {len(jobs)}개 (ip, port), 워커 {self.max_workers}개")
+        self._start_capture()
+        start_time = time.time()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # future -> (대상, 포트, 지금까지의 시도 결과)
+                pending = {executor.submit(self.probe, target, dport): (target, dport, [])
+                           for target, dport in jobs}
+                # 재측정 대기열: (재시도 시각, 순번, 대상, 포트, 시도 결과)
+                retry_queue = []
+                counter = itertools.count()
+
+                with tqdm(total=len(jobs), desc="ECN 측정 진행률") as pbar:
+                    while pending or retry_queue:
+                        now = time.monotonic()
+                        while retry_queue and retry_queue[0][0] <= now:
+                            _, _, target, dport, attempts = heapq.heappop(retry_queue)
+                            pending[executor.submit(self.probe, target, dport)] = (target, dport, attempts)
+                        if not pending:
+                            time.sleep(retry_queue[0][0] - now)
+                            continue
+                        wait_time = retry_queue[0][0] - now if retry_queue else None
+                        done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            target, dport, attempts = pending.pop(future)
+                            try:
+                                attempts.append(future.result())
+                            except Exception as e:
+                                logger.error(f"대상 {target.domain} 처리 중 예외 발생: {e}")
+                                pbar.update(1)
+                                continue
+                            if self._should_retry(attempts):
+                                heapq.heappush(retry_queue, (time.monotonic() + self._retry_delay(len(attempts)),
+                                                             next(counter), target, dport, attempts))
+                                continue
+                            self._emit(self._final_result(attempts), results)
+                            pbar.update(1)
+        finally:
+            self._stop_capture()
+            self._flush_outputs()
+
+        elapsed = time.time() - start_time
+        self._print_statistics(results, elapsed)
+        return results
+
+    def save_results(self, results: List[ECNProbeResult], elapsed: float):
+        """대상별 결과와 처리량 요약을 JSON 으로 저장"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        summary = {
+            'summary': {
+                'total_targets': len(results),
+                'outcomes': self._count_outcomes(results),
+                'verdicts': self._count_verdicts(results),
+                'cached': sum(1 for r in results if r.cached_at),
+                'negotiations': self._count_negotiations(results),
+                'elapsed': elapsed,
+                'targets_per_second': len(results) / elapsed if elapsed > 0 else 0,
+                'timestamp': timestamp,
+                'source_ip': self.my_ip
+            },
+            'targets': [asdict(r) for r in results]
+        }
+        filepath = os.path.join(self.output_dir, f"ecn_batch_{self.my_ip}_{timestamp}.json")
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        logger.info(f"요약 파일 저장: {filepath}")
+
+    def _count_outcomes(self, results: List[ECNProbeResult]) -> Dict[str, int]:
+        counts = {label: 0 for label in RESULT_LABELS}
+        for r in results:
+            counts[r.outcome] = counts.get(r.outcome, 0) + 1
+        return counts
+
+    def _count_verdicts(self, results: List[ECNProbeResult]) -> Dict[str, int]:
+        counts = {}
+        for r in results:
+            if r.ecn_verdict:
+                counts[r.ecn_verdict] = counts.get(r.ecn_verdict, 0) + 1
+        return counts
+
+    def _count_negotiations(self, results: List[ECNProbeResult]) -> Dict[str, int]:
+        counts = {}
+        for r in results:
+            if r.negotiation:
+                counts[r.negotiation] = counts.get(r.negotiation, 0) + 1
+        return counts
+
+    def _print_statistics(self, results: List[ECNProbeResult], elapsed: float):
+        """결과 라벨별 통계와 처리량 출력"""
+        if not results:
+            logger.warning("출력할 결과가 없습니다.")
+            return
+
+        logger.info("=" * 60)
+        logger.info("ECN 서버 측정 결과 통계")
+        logger.info("=" * 60)
+        logger.info(f"총 대상: {len(results)}개")
+        for label, count in self._count_outcomes(results).items():
+            logger.info(f"{label}: {count}개 ({count/len(results)*100:.1f}%)")
+        for verdict, count in self._count_verdicts(results).items():
+            logger.info(f"  데이터 경로 {verdict}: {count}개")
+        for negotiation, count in self._count_negotiations(results).items():
+            logger.info(f"SYN 협상 {negotiation}: {count}개")
+        families = sorted(set(r.family for r in results))
+        if len(families) > 1:
+            for family in families:
+                family_results = [r for r in results if r.family == family]
+                ecn_capable = sum(1 for r in family_results if r.outcome == 'SAE-ECN')
+                logger.info(f"IPv{family}: {len(family_results)}개 (SAE-ECN {ecn_capable}개)")
+        sources = sorted(set(r.source for r in results if r.source))
+        if len(sources) > 1:
+            for source in sources:
+                source_results = [r for r in results if r.source == source]
+                ecn_capable = sum(1 for r in source_results if r.outcome == 'SAE-ECN')
+                logger.info(f"출발지 {source}: {len(source_results)}개 (SAE-ECN {ecn_capable}개)")
+        retried = sum(1 for r in results if r.attempt_outcomes)
+        if retried:
+            logger.info(f"재측정한 작업: {retried}개")
+        cached = sum(1 for r in results if r.cached_at)
+        if cached:
+            logger.info(f"캐시에서 가져온 결과: {cached}개")
+        shared = sum(1 for r in results if r.shared_from)
+        if shared:
+            logger.info(f"묶음 측정 결과를 복사한 작업: {shared}개 (핸드셰이크 {len(results) - shared - cached}개)")
+        logger.info(f"전체 소요 시간: {elapsed:.2f}초")
+        logger.info(f"처리량: {len(results)/elapsed if elapsed > 0 else 0:.2f} 대상/초")
+        logger.info("=" * 60)
+
+
+def parse_port_range(value: str) -> Tuple[int, int]:
+    """'61000-65535' 형식의 포트 범위 파싱"""
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def parse_families(value: str) -> List[int]:
+    """'4', '6', 'both' 형식의 주소족 목록 파싱"""
+    if value == 'both':
+        return [4, 6]
+    if value in ('4', '6'):
+        return [int(value)]
+    raise argparse.ArgumentTypeError(f"잘못된 주소족: {value} (4, 6, both)")
+
+
+def read_filelist(filelist: str) -> List[str]:
+    """filelist_server.txt 와 같은 파일 목록 읽기"""
+    with open(filelist, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description='단일 프로세스 배치 ECN 서버 측정 도구')
+    parser.add_argument('target_lists', nargs='*', help='대상 리스트 파일 경로 (rank,domain[,ip])')
+    parser.add_argument('--filelist', help='대상 리스트 파일 목록 (예: filelist_server.txt)')
+    parser.add_argument('--workers', type=int, default=32, help='동시 측정 수 (기본값: 32)')
+    parser.add_argument('--timeout', type=float, default=2.0, help='SYN-ACK/FIN 타임아웃 (기본값: 2초)')
+    parser.add_argument('--data-wait', type=float, default=1.0, help='GET 이후 데이터 대기 시간 (기본값: 1초)')
+    parser.add_argument('--event-driven', action='store_true',
+                        help='첫 데이터 세그먼트에서 결과 확정 후 RST 로 종료 (고정 대기 없음)')
+    parser.add_argument('--accecn', action='store_true',
+                        help='SYN 에 AE 도 설정하여 고전 ECN / AccECN / 미지원을 한 번에 구분')
+    parser.add_argument('--ports', type=parse_ports, default=[80],
+                        help='대상별 포트 목록이 없을 때 측정할 포트, 예: 80,443 (기본값: 80)')
+    parser.add_argument('--family', type=parse_families, default=[4],
+                        help='IP 가 없는 대상의 DNS 조회 주소족: 4, 6, both (기본값: 4, 리스트의 IPv6 주소는 항상 IPv6 로 측정)')
+    parser.add_argument('--port-range', type=parse_port_range, default=(DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH),
+                        help=f'측정 전용 출발지 포트 범위 (기본값: {DEFAULT_PORT_LOW}-{DEFAULT_PORT_HIGH})')
+    parser.add_argument('--segment', action='store_true', help='텍스트 결과와 함께 바이너리 세그먼트 파일 기록')
+    parser.add_argument('--journal', default=None,
+                        help='캠페인 저널 파일: 완료된 (대상, 포트)를 기록하고 재시작 시 건너뜀')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='Error/SAE-notECN 결과의 최대 재측정 횟수, 최종 라벨은 다수결 (기본값: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=1.0, help='첫 재측정 전 대기 시간, 이후 2배씩 증가 (기본값: 1초)')
+    parser.add_argument('--no-group', action='store_true',
+                        help='같은 (ip, port) 의 도메인도 각각 측정 (기본값: 한 번 측정 후 결과 복사)')
+    parser.add_argument('--group-sni', action='store_true', help='443 은 SNI(도메인)별로 따로 측정')
+    parser.add_argument('--cache', default=None,
+                        help='신선도 캐시 sqlite 파일: --cache-max-age 이내에 측정한 (ip, port)는 다시 측정하지 않음')
+    parser.add_argument('--cache-max-age', type=float, default=24.0, help='캐시 결과의 최대 유효 시간 (시간, 기본값: 24)')
+    parser.add_argument('--source', type=parse_source, action='append', default=None,
+                        help='측정 출발지 ADDR[@IFACE][/RATE], 여러 번 지정하면 대상을 번갈아 배분 (예: 203.0.113.5@eth1/300)')
+    parser.add_argument('--rate', type=float, default=0.0, help='출발지별 초당 새 핸드셰이크 수, 0 은 무제한 (기본값: 0)')
+    parser.add_argument('--no-rst-rule', action='store_true', help='커널 RST 차단 iptables 규칙을 설치하지 않음')
+    parser.add_argument('--www', action='store_true', help='도메인 앞에 www. 추가 (ecn_www.py 동작)')
+    parser.add_argument('--iface', default=None, help='캡처 인터페이스 (기본값: scapy conf.iface)')
+    parser.add_argument('--my-ip', default=None, help='내 공인 IP (지정 시 api.ipify.org 조회 생략)')
+    parser.add_argument('--output-dir', default='ecnserver', help='출력 디렉토리 (기본값: ecnserver)')
+
+    args = parser.parse_args()
+
+    list_files = list(args.target_lists)
+    if args.filelist:
+        list_files.extend(read_filelist(args.filelist))
+    if not list_files:
+        parser.error('대상 리스트 파일 또는 --filelist 를 지정하세요')
+
+    prober = BatchECNProber(
+        max_workers=args.workers,
+        timeout=args.timeout,
+        data_wait=args.data_wait,
+        ports=args.ports,
+        output_dir=args.output_dir,
+        interface=args.iface,
+        my_ip=args.my_ip,
+        event_driven=args.event_driven,
+        port_range=args.port_range,
+        suppress_rst=not args.no_rst_rule,
+        segment=args.segment,
+        journal=args.journal,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        families=args.family,
+        group_targets=not args.no_group,
+        group_sni=args.group_sni,
+        cache=args.cache,
+        cache_max_age=args.cache_max_age * 3600,
+        accecn=args.accecn,
+        sources=args.source,
+        rate=args.rate
+    )
+
+    try:
+        targets = load_targets(list_files, add_www=args.www)
+        start_time = time.time()
+        results = prober.run(targets)
+        prober.save_results(results, time.time() - start_time)
+    except KeyboardInterrupt:
+        logger.info("사용자에 의해 중단되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
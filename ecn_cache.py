@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 86400.0
+
+
+class ProbeCache:
+    """(vantage, ip, port, 측정 종류) -> 결과와 측정 시각을 저장하는 sqlite 신선도 캐시
+
+    같은 vantage 에서 max_age 초 이내에 측정한 대상은 다시 보내지 않고 저장된 결과를 사용한다.
+    Error 처럼 일시적인 결과는 호출하는 쪽에서 저장하지 않는다.
+    여러 워커 스레드에서 함께 쓰므로 연결 하나를 lock 으로 보호하고 commit_every 건마다 commit 한다.
+    """
+
+    def __init__(self, file_name: str, vantage: str, max_age: float = DEFAULT_MAX_AGE, commit_every: int = 1000):
+        self.file_name = file_name
+        self.vantage = vantage
+        self.max_age = max_age
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_name, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS probes ('
+            'vantage TEXT NOT NULL, ip TEXT NOT NULL, port INTEGER NOT NULL, probe TEXT NOT NULL, '
+            'outcome TEXT NOT NULL, data TEXT NOT NULL, measured REAL NOT NULL, '
+            'PRIMARY KEY (vantage, ip, port, probe))')
+        self._conn.commit()
+        count = self._conn.execute('SELECT COUNT(*) FROM probes WHERE vantage = ? AND measured >= ?',
+                                   (vantage, time.time() - max_age)).fetchone()[0]
+        logger.info(f"캐시 {file_name}: vantage {vantage} 의 유효한 결과 {count}개 (최대 {max_age:.0f}초)")
+
+    def get(self, ip_addr: str, port: int, probe: str) -> Optional[Tuple[str, Dict, float]]:
+        """max_age 이내의 (결과, 부가 데이터, 측정 시각) 또는 None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT outcome, data, measured FROM probes WHERE vantage = ? AND ip = ? AND port = ? AND probe = ?',
+                (self.vantage, ip_addr, port, probe)).fetchone()
+        if row is None or time.time() - row[2] > self.max_age:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, ip_addr: str, port: int, probe: str, outcome: str, data: Dict, measured: Optional[float] = None):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (self.vantage, ip_addr, port, probe, outcome, json.dumps(data),
+                                measured or time.time()))
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def commit(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+
+def cached_at(measured: float) -> str:
+    """보고서에 표시할 캐시 결과의 원래 측정 시각"""
+    return datetime.fromtimestamp(measured).isoformat()
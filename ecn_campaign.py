@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+import os
+import time
+import argparse
+import logging
+from datetime import datetime
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from ecn_batch import (ECNTarget, ECNProbeResult, load_targets, parse_families, parse_port_range, parse_ports,
+                       read_filelist)
+from ecn_async import AsyncECNEngine
+from ecn_portpool import DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH
+from ecn_sources import parse_source
+from ecn_synscan import StatelessSynScanner
+
+logger = logging.getLogger(__name__)
+
+# 1단계 스크린 결과 -> 최종 라벨 (SAE 는 2단계 측정 결과를 사용)
+SCREEN_OUTCOMES = {
+    'notSAE': 'notSAE-notECN',
+    'RST': 'Error',
+    'none': 'Error',
+}
+
+
+class TwoPhaseCampaign:
+    """1단계: 전체 대상 SYN 스크린, 2단계: SAE 응답 호스트만 전체 핸드셰이크 측정"""
+
+    def __init__(self, engine: AsyncECNEngine, screen_rate: float = 10000.0, cooldown: float = 5.0,
+                 resolve_workers: int = 64):
+        self.engine = engine
+        self.screen_rate = screen_rate
+        self.cooldown = cooldown
+        self.resolve_workers = resolve_workers
+        # (ip, port) -> SAE/notSAE/RST
+        self.screen: Dict[Tuple[str, int], str] = {}
+
+    def _on_screen_reply(self, label: str, ip_addr: str, port: int):
+        self.screen[(ip_addr, port)] = label
+
+    def _resolve_all(self, targets: List[ECNTarget]):
+        """IP 가 없는 대상은 1단계 전에 DNS 조회"""
+        unresolved = [t for t in targets if not t.ip]
+        if not unresolved:
+            return
+        logger.info(f"DNS 조회 대상: {len(unresolved)}개")
+        with ThreadPoolExecutor(max_workers=self.resolve_workers) as executor:
+            for target, ip_addr in zip(unresolved, executor.map(self.engine._resolve, unresolved)):
+                target.ip = ip_addr or ''
+
+    def run_screen(self, jobs: List[Tuple[ECNTarget, int]]):
+        """1단계: 남은 작업의 중복 없는 IP 목록과 모든 포트에 대해 상태 없는 SYN 스크린 수행"""
+        ips = list(dict.fromkeys(t.ip for t, _ in jobs if t.ip))
+        dports = list(dict.fromkeys(dport for _, dport in jobs))
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.engine.output_dir, f"synscan_{self.engine.my_ip}_{timestamp}.csv")
+        scanner = StatelessSynScanner(output_file, rate=self.screen_rate, dports=dports,
+                                      cooldown=self.cooldown, interface=self.engine.interface,
+                                      callback=self._on_screen_reply)
+        logger.info(f"[1단계] SYN 스크린 시작: {len(ips)}개 IP, 포트 {dports}")
+        scanner.scan(iter(ips))
+
+    def run(self, targets: List[ECNTarget]) -> List[ECNProbeResult]:
+        # IPv4/IPv6 를 함께 측정하면 IP 없는 대상을 주소족별로 나눈 뒤 조회
+        targets = self.engine._expand_families(targets)
+        self._resolve_all(targets)
+        # 신선도 캐시에 있는 (대상, 포트)는 스크린 없이 저장된 결과 사용
+        results = []
+        jobs = self.engine._cached_jobs(self.engine._jobs(targets), results)
+        self.run_screen(jobs)
+
+        # SAE 로 응답한 포트만 남겨 2단계 측정 (캐시 조회 시 배정된 출발지 유지)
+        sae_targets: Dict[int, ECNTarget] = {}
+        sae_ports: Dict[int, List[int]] = {}
+        for target, dport in jobs:
+            if self.screen.get((target.ip, dport)) == 'SAE':
+                sae_targets[id(target)] = target
+                sae_ports.setdefault(id(target), []).append(dport)
+        full_targets = [replace(target, ports=sae_ports[key]) for key, target in sae_targets.items()]
+        logger.info(f"[2단계] SAE 응답 {sum(len(t.ports) for t in full_targets)}/{len(jobs)}개 (ip, port) "
+                    f"전체 핸드셰이크 측정")
+        sae_results = self.engine.run(full_targets) if full_targets else []
+        for result in sae_results:
+            result.screen = 'SAE'
+        results.extend(sae_results)
+
+        # 1단계에서 끝난 (대상, 포트)는 스크린 결과로 최종 라벨 결정
+        for target, dport in jobs:
+            label = self.screen.get((target.ip, dport), 'none') if target.ip else 'none'
+            if label == 'SAE':
+                continue
+            result = ECNProbeResult(
+                rank=target.rank,
+                domain=target.domain,
+                ip=target.ip or 'N/A',
+                outcome=SCREEN_OUTCOMES[label],
+                flags=0,
+                ecnon=0,
+                sport=0,
+                dport=dport,
+                response_time=0.0,
+                timestamp=datetime.now().isoformat(),
+                error='' if label == 'notSAE' else f'screen: {label}',
+                screen=label,
+                family=target.family or 4
+            )
+            self.engine._emit(result, results)
+        self.engine._flush_outputs()
+        return results
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description='2단계 ECN 캠페인 (SYN 스크린 -> SAE 호스트 전체 측정)')
+    parser.add_argument('target_lists', nargs='*', help='대상 리스트 파일 경로 (rank,domain[,ip])')
+    parser.add_argument('--filelist', help='대상 리스트 파일 목록 (예: filelist_server.txt)')
+    parser.add_argument('--screen-rate', type=float, default=10000.0, help='1단계 초당 SYN 수 (기본값: 10000)')
+    parser.add_argument('--cooldown', type=float, default=5.0, help='1단계 응답 대기 시간 (기본값: 5초)')
+    parser.add_argument('--inflight', type=int, default=1000, help='2단계 동시 진행 핸드셰이크 수 (기본값: 1000)')
+    parser.add_argument('--rate', type=float, default=200.0, help='2단계 초당 새 핸드셰이크 수 (기본값: 200)')
+    parser.add_argument('--timeout', type=float, default=2.0, help='SYN-ACK/FIN 타임아웃 (기본값: 2초)')
+    parser.add_argument('--data-wait', type=float, default=1.0, help='GET 이후 데이터 대기 시간 (기본값: 1초)')
+    parser.add_argument('--event-driven', action='store_true',
+                        help='첫 데이터 세그먼트에서 결과 확정 후 RST 로 종료 (고정 대기 없음)')
+    parser.add_argument('--accecn', action='store_true',
+                        help='SYN 에 AE 도 설정하여 고전 ECN / AccECN / 미지원을 한 번에 구분')
+    parser.add_argument('--ports', type=parse_ports, default=[80],
+                        help='대상별 포트 목록이 없을 때 측정할 포트, 예: 80,443 (기본값: 80)')
+    parser.add_argument('--family', type=parse_families, default=[4],
+                        help='IP 가 없는 대상의 DNS 조회 주소족: 4, 6, both (기본값: 4, 리스트의 IPv6 주소는 항상 IPv6 로 측정)')
+    parser.add_argument('--port-range', type=parse_port_range, default=(DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH),
+                        help=f'측정 전용 출발지 포트 범위 (기본값: {DEFAULT_PORT_LOW}-{DEFAULT_PORT_HIGH})')
+    parser.add_argument('--segment', action='store_true', help='텍스트 결과와 함께 바이너리 세그먼트 파일 기록')
+    parser.add_argument('--journal', default=None,
+                        help='캠페인 저널 파일: 완료된 (대상, 포트)를 기록하고 재시작 시 건너뜀')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='Error/SAE-notECN 결과의 최대 재측정 횟수, 최종 라벨은 다수결 (기본값: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=1.0, help='첫 재측정 전 대기 시간, 이후 2배씩 증가 (기본값: 1초)')
+    parser.add_argument('--source', type=parse_source, action='append', default=None,
+                        help='2단계 측정 출발지 ADDR[@IFACE][/RATE], 여러 번 지정하면 대상을 번갈아 배분')
+    parser.add_argument('--no-rst-rule', action='store_true', help='커널 RST 차단 iptables 규칙을 설치하지 않음')
+    parser.add_argument('--no-group', action='store_true',
+                        help='같은 (ip, port) 의 도메인도 각각 측정 (기본값: 한 번 측정 후 결과 복사)')
+    parser.add_argument('--group-sni', action='store_true', help='443 은 SNI(도메인)별로 따로 측정')
+    parser.add_argument('--cache', default=None,
+                        help='신선도 캐시 sqlite 파일: --cache-max-age 이내에 측정한 (ip, port)는 다시 측정하지 않음')
+    parser.add_argument('--cache-max-age', type=float, default=24.0, help='캐시 결과의 최대 유효 시간 (시간, 기본값: 24)')
+    parser.add_argument('--www', action='store_true', help='도메인 앞에 www. 추가 (ecn_www.py 동작)')
+    parser.add_argument('--iface', default=None, help='인터페이스 (기본값: scapy conf.iface)')
+    parser.add_argument('--my-ip', default=None, help='내 공인 IP (지정 시 api.ipify.org 조회 생략)')
+    parser.add_argument('--output-dir', default='ecnserver', help='출력 디렉토리 (기본값: ecnserver)')
+
+    args = parser.parse_args()
+
+    list_files = list(args.target_lists)
+    if args.filelist:
+        list_files.extend(read_filelist(args.filelist))
+    if not list_files:
+        parser.error('대상 리스트 파일 또는 --filelist 를 지정하세요')
+
+    engine = AsyncECNEngine(
+        max_inflight=args.inflight,
+        rate=args.rate,
+        timeout=args.timeout,
+        data_wait=args.data_wait,
+        ports=args.ports,
+        output_dir=args.output_dir,
+        interface=args.iface,
+        my_ip=args.my_ip,
+        event_driven=args.event_driven,
+        port_range=args.port_range,
+        suppress_rst=not args.no_rst_rule,
+        segment=args.segment,
+        journal=args.journal,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        families=args.family,
+        group_targets=not args.no_group,
+        group_sni=args.group_sni,
+        cache=args.cache,
+        cache_max_age=args.cache_max_age * 3600,
+        accecn=args.accecn,
+        sources=args.source
+    )
+    campaign = TwoPhaseCampaign(engine, screen_rate=args.screen_rate, cooldown=args.cooldown)
+
+    try:
+        targets = load_targets(list_files, add_www=args.www)
+        start_time = time.time()
+        results = campaign.run(targets)
+        elapsed = time.time() - start_time
+        engine._print_statistics(results, elapsed)
+        engine.save_results(results, elapsed)
+    except KeyboardInterrupt:
+        logger.info("사용자에 의해 중단되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import os
+import logging
+from typing import Set, Tuple
+from ecn_sniffer import ip_version
+
+logger = logging.getLogger(__name__)
+
+
+class CampaignJournal:
+    """완료된 (대상, 포트)를 기록하여 재시작 시 이미 측정한 작업을 건너뛰는 캠페인 저널
+
+    한 줄에 'domain,ip,port,family' 하나를 append 하고, 시작할 때 전체를 set 으로 읽어 O(1) 로 조회한다.
+    기록은 결과 파일과 같은 OutcomeWriter 로 결과 줄 뒤에 쓰이므로 결과 없이 완료 표시만 남지 않는다.
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        # 리스트에 IP 가 있는 대상은 (domain, ip, port), DNS 로 조회하는 대상은 (domain, port, 주소족) 로 조회
+        self.completed: Set[Tuple[str, str, int]] = set()
+        self.completed_domains: Set[Tuple[str, int, int]] = set()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, 'r+b') as f:
+            valid = 0
+            for line in f:
+                # 크래시로 잘린 마지막 줄은 이후 기록과 붙지 않도록 잘라냄
+                if not line.endswith(b'\n'):
+                    f.truncate(valid)
+                    break
+                valid += len(line)
+                item = line.decode('utf-8', 'replace').rstrip('\n').split(',')
+                if len(item) in (3, 4) and item[2].isdigit():
+                    family = int(item[3]) if len(item) == 4 and item[3].isdigit() else ip_version(item[1])
+                    self._add(item[0], item[1], int(item[2]), family)
+        logger.info(f"저널 {self.file_name}: 완료된 작업 {len(self.completed)}개")
+
+    def _add(self, domain: str, ip_addr: str, port: int, family: int):
+        self.completed.add((domain, ip_addr, port))
+        self.completed_domains.add((domain, port, family or 4))
+
+    def done(self, domain: str, ip_addr: str, port: int, family: int = 4) -> bool:
+        if ip_addr:
+            return (domain, ip_addr, port) in self.completed
+        return (domain, port, family or 4) in self.completed_domains
+
+    def __len__(self) -> int:
+        return len(self.completed)
+
+    def entry(self, domain: str, ip_addr: str, port: int, family: int) -> str:
+        """저널에 기록할 줄을 만들고 완료 집합에 추가"""
+        self._add(domain, ip_addr, port, family)
+        return f"{domain},{ip_addr},{port},{family or 4}\n"
@@ -9,16 +9,21 @@ import threading
 from time import sleep
 from random import *
 import ctypes 
+import json
+import argparse
 from datetime import date
+from ecn_batch import BatchECNProber, ECNTarget, INVALID_VALUES, parse_families, parse_ports
+from ecn_sniffer import canonical_ip, ip_version
 
-MyIP = get('https://api.ipify.org').text
 today = date.today() 
 x="%.0f"%time.time()
 start_time = time.time()
 destip = '0.0.0.0'
 
-result_file_name = 'ecnserver/result_'+str(MyIP)+'.txt'
-revise_file_name = 'ecnserver/revise_'+str(MyIP)+'.txt'
+# set by main_line() for the legacy one-target-per-process mode
+MyIP = None
+result_file_name = None
+revise_file_name = None
 
 class Sniffer(threading.Thread):
     def  __init__(self, interface="eno33"):
@@ -30,18 +35,19 @@ class Sniffer(threading.Thread):
         self.lock = 0
         self.ecnon = 0
         self.flags = 0
+        self.ready = threading.Event()
         print('[**] init sniffer destip: ',destip, ' flags = ', self.flags, 'seq: ', self.seq, ' ack = ', self.ack, ' lock = ', self.lock, ' ecnon = ', self.ecnon)
 
     def run(self):
         try:
-            sniff(iface=self.interface, filter="tcp port 80", prn=self.print_packet, store=0)
+            sniff(iface=self.interface, filter="tcp port 80", prn=self.print_packet, store=0, started_callback=self.ready.set)
         finally: 
             print('ended') 
 
     def print_packet(self, packet):
         ip_layer = packet.getlayer(IP)
         if IP in packet and packet[IP].src == destip: #who-has or is-at
-            ecn_bits = packet[IP].tos & 0xf
+            ecn_bits = packet[IP].tos & 0x3
             tmp_flag = str(packet[TCP].flags)
             # print(tmp_flag)
             if self.flags == 0:
@@ -63,7 +69,7 @@ class Sniffer(threading.Thread):
             print('[&&&&] flags: ', packet[TCP].flags, ' ecn = ', ecn_bits, ' payload = ', payload, ' seq = ', packet[TCP].seq, ' ack = ', packet[TCP].ack)
             print('[&&&&] sniffer destip: ',destip, ' flags = ', self.flags, 'seq: ', self.seq, ' ack = ', self.ack, ' lock = ', self.lock, ' ecnon = ', self.ecnon)
 
-def run_ipv4(ip_addr, domain_name):
+def run_ipv4(ip_addr, domain_name, sniffer):
     dport = 80
     seqnum = randint(1, 4294967295)
     try:
@@ -119,7 +125,7 @@ def run_ipv4(ip_addr, domain_name):
         opened_file.close()
         os.system("pkill -9 python3")
 
-def run_ipv6(ip_addr, domain_name):
+def run_ipv6(ip_addr, domain_name, sniffer):
     dport = 80
     seqnum = randint(1, 4294967295)
     try:
@@ -187,25 +193,156 @@ def run_one_ecn(ip_addr, domain_name):
     print("[*] Start sniffing... with ", domain_name)
     sniffer.start()
 
-    time.sleep(2)
+    # wait until the capture socket is open instead of a fixed sleep
+    sniffer.ready.wait(2)
 
 
     pattern = "^\d{1,3}.\d{1,3}.\d{1,3}.\d{1,3}$"
     match = re.match(pattern, destip)
     if (match):
-        run_ipv4(destip, domain_name)
+        run_ipv4(destip, domain_name, sniffer)
     else:
         os.system("pkill -9 python3")
-        # run_ipv6(destip, domain_name)
+        # run_ipv6(destip, domain_name, sniffer)
     # except:
     #     print("Error", domain_name)
 
-def main():
+def iter_ndjson_records(ndjson_file):
+    """Yield one dict per JSON object, reading the file line by line.
+
+    Tolerates the pathspider dump layout where objects are separated by
+    '},' or wrapped in '[ ... ]', as well as plain one-object-per-line NDJSON.
+    """
+    decoder = json.JSONDecoder()
+    with open(ndjson_file, 'r', encoding='utf-8', errors='replace') as f:
+        for line_number, line in enumerate(f, 1):
+            pos = 0
+            end = len(line)
+            while pos < end:
+                while pos < end and line[pos] in ' \t\r\n,[]':
+                    pos += 1
+                if pos >= end:
+                    break
+                try:
+                    record, pos = decoder.raw_decode(line, pos)
+                except json.JSONDecodeError:
+                    print('[!] skipping malformed line', line_number, 'in', ndjson_file)
+                    break
+                if isinstance(record, dict):
+                    yield record
+
+
+def iter_ndjson_targets(ndjson_files, domain_field='domain', ip_field='dip', rank_field='rank', add_www=False):
+    """Project (domain, dip, rank) out of NDJSON records into ECNTargets.
+
+    Records without a usable address are resolved by the prober at probe time.
+    """
+    for ndjson_file in ndjson_files:
+        for number, record in enumerate(iter_ndjson_records(ndjson_file), 1):
+            domain = str(record.get(domain_field) or '').strip()
+            if not domain or domain.upper() in INVALID_VALUES:
+                continue
+            if add_www and domain.find('www.') < 0:
+                domain = 'www.' + domain
+            ip_addr = record.get(ip_field) or ''
+            if isinstance(ip_addr, list):
+                ip_addr = ip_addr[0] if ip_addr else ''
+            ip_addr = str(ip_addr).strip()
+            ip_addr = canonical_ip(ip_addr) if ip_version(ip_addr) else ''
+            rank = str(record.get(rank_field, number))
+            yield ECNTarget(rank=rank, domain=domain, ip=ip_addr, family=ip_version(ip_addr) if ip_addr else 0)
+
+
+def iter_chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main_ndjson(argv):
+    """Probe every target of the NDJSON files with one batch prober process."""
+    parser = argparse.ArgumentParser(description='ECN server measurement fed directly from NDJSON target files')
+    parser.add_argument('ndjson_files', nargs='+', help='NDJSON target files (e.g. web_300000.ndjson)')
+    parser.add_argument('--domain-field', default='domain', help='domain field name (default: domain)')
+    parser.add_argument('--ip-field', default='dip', help='address field name (default: dip)')
+    parser.add_argument('--rank-field', default='rank', help='rank field name (default: line number if absent)')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='targets handed to the prober at a time, bounds memory (default: 10000)')
+    parser.add_argument('--workers', type=int, default=32, help='concurrent probes (default: 32)')
+    parser.add_argument('--timeout', type=float, default=2.0, help='SYN-ACK/FIN timeout (default: 2s)')
+    parser.add_argument('--data-wait', type=float, default=1.0, help='wait for data after the GET (default: 1s)')
+    parser.add_argument('--accecn', action='store_true',
+                        help='also set AE in the SYN to tell classic ECN, AccECN and no ECN apart')
+    parser.add_argument('--ports', type=parse_ports, default=[80], help='ports to probe, e.g. 80,443 (default: 80)')
+    parser.add_argument('--family', type=parse_families, default=[4],
+                        help='lookup family for records without dip: 4, 6, both (default: 4)')
+    parser.add_argument('--journal', default=None, help='campaign journal file, completed targets are skipped')
+    parser.add_argument('--retries', type=int, default=0, help='re-probes for Error/SAE-notECN (default: 0)')
+    parser.add_argument('--no-group', action='store_true',
+                        help='probe every domain even when several share an (ip, port) within a chunk')
+    parser.add_argument('--group-sni', action='store_true', help='keep one probe per SNI on port 443')
+    parser.add_argument('--cache', default=None,
+                        help='freshness cache (sqlite): (ip, port) probed within --cache-max-age are not re-probed')
+    parser.add_argument('--cache-max-age', type=float, default=24.0, help='cache entry lifetime in hours (default: 24)')
+    parser.add_argument('--www', action='store_true', help='prefix domains with www.')
+    parser.add_argument('--iface', default=None, help='capture interface (default: scapy conf.iface)')
+    parser.add_argument('--my-ip', default=None, help='public IP of this vantage (skips api.ipify.org)')
+    parser.add_argument('--output-dir', default='ecnserver', help='output directory (default: ecnserver)')
+    args = parser.parse_args(argv)
+
+    prober = BatchECNProber(
+        max_workers=args.workers,
+        timeout=args.timeout,
+        data_wait=args.data_wait,
+        ports=args.ports,
+        output_dir=args.output_dir,
+        interface=args.iface,
+        my_ip=args.my_ip,
+        journal=args.journal,
+        retries=args.retries,
+        families=args.family,
+        group_targets=not args.no_group,
+        group_sni=args.group_sni,
+        cache=args.cache,
+        cache_max_age=args.cache_max_age * 3600,
+        accecn=args.accecn
+    )
+    targets = iter_ndjson_targets(args.ndjson_files, args.domain_field, args.ip_field, args.rank_field, args.www)
+    try:
+        for chunk in iter_chunks(targets, args.chunk_size):
+            chunk_start = time.time()
+            results = prober.run(chunk)
+            prober.save_results(results, time.time() - chunk_start)
+    except KeyboardInterrupt:
+        print('[*] interrupted')
+
+
+def main_line(line):
+    """Legacy mode: probe one 'x,domain,ip' line in this process."""
+    global MyIP, result_file_name, revise_file_name
+    MyIP = get('https://api.ipify.org').text
+    result_file_name = 'ecnserver/result_'+str(MyIP)+'.txt'
+    revise_file_name = 'ecnserver/revise_'+str(MyIP)+'.txt'
 
-    line= sys.argv[1]
     domain_name = line.split(',')[1]
     ip_address = line.split(',')[2]
     print(domain_name, ip_address)
     run_one_ecn(ip_address, domain_name)
 
-main()
+
+def main():
+    # a single 'x,domain,ip' argument keeps the old per-line behaviour,
+    # anything else is treated as NDJSON target files
+    if len(sys.argv) == 2 and not os.path.exists(sys.argv[1]) and sys.argv[1].count(',') >= 2:
+        main_line(sys.argv[1])
+    else:
+        main_ndjson(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+import socket
+import struct
+import selectors
+import heapq
+import itertools
+import time
+import errno
+import argparse
+import logging
+from typing import List, Optional
+from ecn_batch import (BatchECNProber, ECNTarget, ECNProbeResult, build_request, classify, load_targets,
+                       parse_families, parse_ports, read_filelist)
+from ecn_sources import parse_source
+
+logger = logging.getLogger(__name__)
+
+# linux/tcp.h
+TCP_INFO = getattr(socket, 'TCP_INFO', 11)
+TCPI_OPT_ECN = 8         # SYN-ACK 에 ECE 가 있어 ECN 협상 성공
+TCPI_OPT_ECN_SEEN = 16   # ECT(0)/ECT(1)/CE 표시된 세그먼트를 수신
+TCP_INFO_OPTIONS_OFFSET = 5
+IP_RECVTOS = getattr(socket, 'IP_RECVTOS', 13)
+IP_TOS = socket.IP_TOS
+IPV6_RECVTCLASS = getattr(socket, 'IPV6_RECVTCLASS', 66)
+IPV6_TCLASS = getattr(socket, 'IPV6_TCLASS', 67)
+TCP_ECN_SYSCTL = '/proc/sys/net/ipv4/tcp_ecn'
+
+
+def read_tcp_ecn_sysctl() -> Optional[int]:
+    """net.ipv4.tcp_ecn 값 (1 이어야 커널이 SYN 에 ECE|CWR 를 설정)"""
+    try:
+        with open(TCP_ECN_SYSCTL) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class KernelFlow:
+    """커널 TCP 소켓 하나의 측정 상태"""
+
+    def __init__(self, target: ECNTarget, ip_addr: str, dport: int, sock: socket.socket, deadline: float):
+        self.target = target
+        self.ip_addr = ip_addr
+        self.dport = dport
+        self.sock = sock
+        self.deadline = deadline
+        self.start_time = time.time()
+        self.connected = False
+        self.flags = 0
+        self.ecnon = 0
+        self.tos = None
+        # 커널이 협상하므로 SYN-ACK 의 ACE 는 읽지 않음 (BatchECNProber._make_result 와 같은 속성)
+        self.accecn = False
+        # 연결을 연 측정 출발지
+        self.source = None
+        # recvmsg 호출별 TOS 코드포인트 수 [Not-ECT, ECT(1), ECT(0), CE]
+        # TOS cmsg 를 한 번도 받지 못하면 None (코드포인트 수를 알 수 없으므로 경로 판정도 하지 않음)
+        self.ecn_counts = None
+        self.error = ''
+        # 재측정 시 이전 시도 결과
+        self.attempts: List[ECNProbeResult] = []
+
+
+class KernelECNProber(BatchECNProber):
+    """raw 패킷 대신 커널 TCP 스택으로 ECN 협상을 수행하는 측정기
+
+    SYN-ACK 협상 결과와 데이터 세그먼트의 ECN 표시는 TCP_INFO 의 tcpi_options 와
+    IP_RECVTOS 보조 데이터(cmsg)로 읽는다.
+    connect 는 출발지별 전송 예산(RateBudget) 슬롯에 맞춰 시작하며, 슬롯을 기다리는 동안 이벤트 루프를 막지 않는다.
+    """
+
+    # 커널 스택 측정은 raw 측정과 결과가 다를 수 있으므로 캐시에서 따로 관리
+    probe_type = 'ecn-kernel'
+
+    def __init__(self, max_inflight: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_inflight = max_inflight
+        self.selector = None
+        sysctl = read_tcp_ecn_sysctl()
+        if sysctl != 1:
+            logger.warning(f"net.ipv4.tcp_ecn = {sysctl}: 커널이 ECN 을 요청하지 않습니다 "
+                           f"(sudo sysctl -w net.ipv4.tcp_ecn=1)")
+
+    def _open(self, target: ECNTarget, dport: int) -> Optional[KernelFlow]:
+        # DNS 는 _prepare_jobs() 에서 미리 조회하므로 이벤트 루프 안에서는 조회하지 않음 (조회 실패 대상은 IP 가 없음)
+        ip_addr = target.ip
+        if not ip_addr:
+            return None
+        if ':' in ip_addr:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVTCLASS, 1)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVTOS, 1)
+        sock.setblocking(False)
+        # TCP 소켓의 ECN 비트는 커널이 관리 (협상 성공 시 데이터를 ECT(0) 로 전송)
+        flow = KernelFlow(target, ip_addr, dport, sock, time.monotonic() + self.timeout)
+        # 같은 주소족의 출발지를 번갈아 bind (출발지 포트는 커널이 할당, 해당 출발지가 없으면 커널 라우팅)
+        flow.source = self._next_source(ip_addr, target.source)
+        if flow.source is not None and flow.source.address:
+            try:
+                sock.bind((flow.source.address, 0))
+            except OSError as e:
+                flow.error = f"bind {flow.source.address}: {e}"
+        return flow
+
+    def _connect(self, flow: KernelFlow):
+        """전송 예산 슬롯이 된 흐름의 연결 시작 (응답 시간과 타임아웃은 connect 시점부터)"""
+        flow.start_time = time.time()
+        flow.deadline = time.monotonic() + self.timeout
+        err = flow.sock.connect_ex((flow.ip_addr, flow.dport))
+        if err not in (0, errno.EINPROGRESS):
+            flow.error = errno.errorcode.get(err, str(err))
+
+    def _tcp_options(self, sock: socket.socket) -> int:
+        info = sock.getsockopt(socket.IPPROTO_TCP, TCP_INFO, 104)
+        return info[TCP_INFO_OPTIONS_OFFSET]
+
+    def _on_connected(self, flow: KernelFlow):
+        err = flow.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            flow.error = errno.errorcode.get(err, str(err))
+            return False
+        flow.connected = True
+        if self._tcp_options(flow.sock) & TCPI_OPT_ECN:
+            flow.flags = 1
+        try:
+            flow.sock.send(build_request(flow.target.domain, flow.dport))
+        except OSError as e:
+            # 핸드셰이크 직후 RST 를 받은 서버 (ECONNRESET/EPIPE) 는 연결 오류와 같이 이 흐름만 종료
+            flow.error = errno.errorcode.get(e.errno, str(e))
+            return False
+        flow.deadline = time.monotonic() + self.data_wait
+        return True
+
+    def _on_readable(self, flow: KernelFlow) -> bool:
+        """응답 데이터 수신: cmsg 의 TOS/traffic class 또는 TCP_INFO 의 ECN_SEEN 으로 ecnon 결정
+
+        TOS cmsg 는 recvmsg 한 번에 하나뿐이므로 코드포인트 수는 읽기 단위로 센다.
+        리눅스 TCP 소켓은 IP_RECVTOS 를 켜도 TOS cmsg 를 전달하지 않으므로 이 경우 ecn_counts 는 None 으로 남고
+        ECN_SEEN 만 사용한다 (결과의 ecn_counts 는 빈 목록, ecn_verdict 는 빈 값).
+        event_driven 이 아니면 연결 종료 또는 data_wait 까지 응답 전체를 읽는다.
+        """
+        try:
+            data, ancdata, _, _ = flow.sock.recvmsg(65536, socket.CMSG_SPACE(4))
+        except BlockingIOError:
+            return False
+        except OSError as e:
+            flow.error = str(e)
+            return True
+        if not data:
+            return True
+        tos = None
+        for level, ctype, cdata in ancdata:
+            if level == socket.IPPROTO_IP and ctype == IP_TOS and cdata:
+                tos = cdata[0]
+            elif level == socket.IPPROTO_IPV6 and ctype == IPV6_TCLASS and len(cdata) >= 4:
+                # IPv6 traffic class 는 int 로 전달됨
+                tos = struct.unpack('i', cdata[:4])[0]
+        if tos is not None:
+            flow.tos = tos
+            if flow.ecn_counts is None:
+                flow.ecn_counts = [0, 0, 0, 0]
+            flow.ecn_counts[tos & 0x3] += 1
+        if tos is not None and tos & 0x3 == 2:
+            flow.ecnon = 1
+        elif self._tcp_options(flow.sock) & TCPI_OPT_ECN_SEEN:
+            flow.ecnon = 1
+        # event_driven 이면 첫 데이터로 결과 확정
+        return self.event_driven
+
+    def _finish(self, flow: KernelFlow) -> ECNProbeResult:
+        try:
+            sport = flow.sock.getsockname()[1]
+        except OSError:
+            sport = 0
+        try:
+            self.selector.unregister(flow.sock)
+        except (KeyError, ValueError):
+            pass
+        # RST 로 즉시 종료 (SO_LINGER 0)
+        flow.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        flow.sock.close()
+
+        if flow.error or not flow.connected:
+            outcome = 'Error'
+        else:
+            outcome = classify(flow.flags, flow.ecnon)
+        return self._make_result(flow.target, flow.ip_addr, flow.dport, outcome, flow, sport, flow.start_time,
+                                 flow.error or ('' if flow.connected else 'connect timeout'))
+
+    def run(self, targets: List[ECNTarget]) -> List[ECNProbeResult]:
+        """selectors 기반 이벤트 루프로 최대 max_inflight 개의 연결을 동시에 진행"""
+        results = []
+        jobs = self._prepare_jobs(targets, results)
+        logger.info(f"커널 스택 ECN 측정 시작: {len(jobs)}개 (ip, port), 동시 연결 {self.max_inflight}개")
+        self.selector = selectors.DefaultSelector()
+        pending = ((target, dport, []) for target, dport in jobs)
+        inflight = {}
+        # 출발지 전송 예산 슬롯을 기다리는 흐름: (connect 시각, 순번, 흐름)
+        waiting = []
+        # 재측정 대기열: (재시도 시각, 순번, 대상, 포트, 시도 결과)
+        retry_queue = []
+        counter = itertools.count()
+        start_time = time.time()
+
+        def record(target: ECNTarget, dport: int, attempts: List[ECNProbeResult], result: ECNProbeResult):
+            attempts.append(result)
+            if self._should_retry(attempts):
+                heapq.heappush(retry_queue, (time.monotonic() + self._retry_delay(len(attempts)),
+                                             next(counter), target, dport, attempts))
+                return
+            self._emit(self._final_result(attempts), results)
+
+        def finish(flow: KernelFlow):
+            record(flow.target, flow.dport, flow.attempts, self._finish(flow))
+
+        def start(flow: KernelFlow):
+            self._connect(flow)
+            if flow.error:
+                finish(flow)
+                return
+            self.selector.register(flow.sock, selectors.EVENT_WRITE, flow)
+            inflight[flow.sock.fileno()] = flow
+
+        try:
+            exhausted = False
+            while inflight or waiting or retry_queue or not exhausted:
+                while waiting and waiting[0][0] <= time.monotonic():
+                    start(heapq.heappop(waiting)[2])
+                # 슬롯을 기다리는 흐름이 있으면 새 흐름을 열지 않음 (예산을 앞당겨 예약하지 않도록)
+                while not waiting and len(inflight) < self.max_inflight:
+                    if retry_queue and retry_queue[0][0] <= time.monotonic():
+                        _, _, target, dport, attempts = heapq.heappop(retry_queue)
+                    elif not exhausted:
+                        job = next(pending, None)
+                        if job is None:
+                            exhausted = True
+                            continue
+                        target, dport, attempts = job
+                    else:
+                        break
+                    flow = self._open(target, dport)
+                    if flow is None:
+                        record(target, dport, attempts,
+                               self._make_result(target, 'N/A', dport, 'Error', None, 0, time.time(), 'resolve failed'))
+                        continue
+                    flow.attempts = attempts
+                    if flow.error:
+                        finish(flow)
+                        continue
+                    delay = flow.source.budget.reserve() if flow.source is not None else 0.0
+                    if delay > 0:
+                        heapq.heappush(waiting, (time.monotonic() + delay, next(counter), flow))
+                    else:
+                        start(flow)
+
+                timeout = 0.05
+                if waiting:
+                    timeout = min(timeout, max(0.0, waiting[0][0] - time.monotonic()))
+                for key, mask in self.selector.select(timeout=timeout):
+                    flow = key.data
+                    done = False
+                    if not flow.connected:
+                        if self._on_connected(flow):
+                            self.selector.modify(flow.sock, selectors.EVENT_READ, flow)
+                        else:
+                            done = True
+                    else:
+                        done = self._on_readable(flow)
+                    if done:
+                        inflight.pop(flow.sock.fileno(), None)
+                        finish(flow)
+
+                now = time.monotonic()
+                for fd, flow in list(inflight.items()):
+                    if now >= flow.deadline:
+                        del inflight[fd]
+                        finish(flow)
+
+                if not inflight and not waiting and exhausted and retry_queue:
+                    # 진행 중인 연결 없이 재측정만 남으면 다음 재시도 시각까지 대기
+                    time.sleep(max(0.0, retry_queue[0][0] - time.monotonic()))
+        finally:
+            # 중단되거나 예외가 나도 진행 중/슬롯 대기 중인 연결을 닫고 버퍼에 남은 결과와 저널을 기록
+            for flow in itertools.chain(inflight.values(), (entry[2] for entry in waiting)):
+                flow.sock.close()
+            self.selector.close()
+            self._flush_outputs()
+
+        self._print_statistics(results, time.time() - start_time)
+        return results
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description='커널 TCP 스택 기반 ECN 서버 측정 도구')
+    parser.add_argument('target_lists', nargs='*', help='대상 리스트 파일 경로 (rank,domain[,ip])')
+    parser.add_argument('--filelist', help='대상 리스트 파일 목록 (예: filelist_server.txt)')
+    parser.add_argument('--inflight', type=int, default=1000, help='동시 연결 수 (기본값: 1000)')
+    parser.add_argument('--timeout', type=float, default=2.0, help='연결 타임아웃 (기본값: 2초)')
+    parser.add_argument('--data-wait', type=float, default=1.0, help='GET 이후 데이터 대기 시간 (기본값: 1초)')
+    parser.add_argument('--event-driven', action='store_true',
+                        help='첫 데이터 세그먼트에서 결과 확정 후 RST 로 종료 (응답 전체를 샘플링하지 않음)')
+    parser.add_argument('--ports', type=parse_ports, default=[80],
+                        help='대상별 포트 목록이 없을 때 측정할 포트, 예: 80,443 (기본값: 80)')
+    parser.add_argument('--family', type=parse_families, default=[4],
+                        help='IP 가 없는 대상의 DNS 조회 주소족: 4, 6, both (기본값: 4, 리스트의 IPv6 주소는 항상 IPv6 로 측정)')
+    parser.add_argument('--source', type=parse_source, action='append', default=None,
+                        help='측정 출발지 ADDR[/RATE], 여러 번 지정하면 연결마다 번갈아 bind (예: 203.0.113.5/300)')
+    parser.add_argument('--rate', type=float, default=0.0, help='출발지별 초당 새 연결 수, 0 은 무제한 (기본값: 0)')
+    parser.add_argument('--segment', action='store_true', help='텍스트 결과와 함께 바이너리 세그먼트 파일 기록')
+    parser.add_argument('--journal', default=None,
+                        help='캠페인 저널 파일: 완료된 (대상, 포트)를 기록하고 재시작 시 건너뜀')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='Error/SAE-notECN 결과의 최대 재측정 횟수, 최종 라벨은 다수결 (기본값: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=1.0, help='첫 재측정 전 대기 시간, 이후 2배씩 증가 (기본값: 1초)')
+    parser.add_argument('--no-group', action='store_true',
+                        help='같은 (ip, port) 의 도메인도 각각 측정 (기본값: 한 번 측정 후 결과 복사)')
+    parser.add_argument('--group-sni', action='store_true', help='443 은 SNI(도메인)별로 따로 측정')
+    parser.add_argument('--cache', default=None,
+                        help='신선도 캐시 sqlite 파일: --cache-max-age 이내에 측정한 (ip, port)는 다시 측정하지 않음')
+    parser.add_argument('--cache-max-age', type=float, default=24.0, help='캐시 결과의 최대 유효 시간 (시간, 기본값: 24)')
+    parser.add_argument('--www', action='store_true', help='도메인 앞에 www. 추가 (ecn_www.py 동작)')
+    parser.add_argument('--my-ip', default=None, help='내 공인 IP (지정 시 api.ipify.org 조회 생략)')
+    parser.add_argument('--output-dir', default='ecnserver', help='출력 디렉토리 (기본값: ecnserver)')
+
+    args = parser.parse_args()
+
+    list_files = list(args.target_lists)
+    if args.filelist:
+        list_files.extend(read_filelist(args.filelist))
+    if not list_files:
+        parser.error('대상 리스트 파일 또는 --filelist 를 지정하세요')
+
+    prober = KernelECNProber(
+        max_inflight=args.inflight,
+        timeout=args.timeout,
+        data_wait=args.data_wait,
+        event_driven=args.event_driven,
+        ports=args.ports,
+        output_dir=args.output_dir,
+        my_ip=args.my_ip,
+        segment=args.segment,
+        journal=args.journal,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        families=args.family,
+        group_targets=not args.no_group,
+        group_sni=args.group_sni,
+        cache=args.cache,
+        cache_max_age=args.cache_max_age * 3600,
+        sources=args.source,
+        rate=args.rate
+    )
+
+    try:
+        targets = load_targets(list_files, add_www=args.www)
+        start_time = time.time()
+        results = prober.run(targets)
+        prober.save_results(results, time.time() - start_time)
+    except KeyboardInterrupt:
+        logger.info("사용자에 의해 중단되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
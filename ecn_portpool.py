@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import time
+import shutil
+import logging
+import subprocess
+import threading
+from collections import deque
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 리눅스 기본 ephemeral 포트 범위(32768-60999) 밖의 포트를 사용하여 커널 소켓과 충돌 방지
+DEFAULT_PORT_LOW = 61000
+DEFAULT_PORT_HIGH = 65535
+
+
+class SourcePortPool:
+    """raw 핸드셰이크용 출발지 포트 풀
+
+    반납된 포트는 quarantine 초 동안 재사용하지 않아 이전 흐름의 늦은 패킷이
+    새 흐름으로 전달되지 않도록 한다.
+    """
+
+    def __init__(self, low: int = DEFAULT_PORT_LOW, high: int = DEFAULT_PORT_HIGH, quarantine: float = 2.0):
+        if not 0 < low <= high <= 65535:
+            raise ValueError(f"잘못된 포트 범위: {low}-{high}")
+        self.low = low
+        self.high = high
+        self.quarantine = quarantine
+        self._free = deque(range(low, high + 1))
+        self._cooling = deque()
+        self._in_use = set()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self.high - self.low + 1
+
+    def __contains__(self, port: int):
+        return self.low <= port <= self.high
+
+    def _reclaim(self, now: float):
+        while self._cooling and self._cooling[0][1] <= now:
+            self._free.append(self._cooling.popleft()[0])
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[int]:
+        """사용 가능한 포트 하나를 할당 (timeout 안에 없으면 None)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._reclaim(now)
+                if self._free:
+                    port = self._free.popleft()
+                    self._in_use.add(port)
+                    return port
+                if deadline is not None and now >= deadline:
+                    return None
+                wait = self._cooling[0][1] - now if self._cooling else None
+                if deadline is not None:
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                self._cond.wait(wait)
+
+    def release(self, port: int):
+        """포트 반납 (quarantine 이후 재사용)"""
+        with self._cond:
+            if port not in self._in_use:
+                return
+            self._in_use.discard(port)
+            self._cooling.append((port, time.monotonic() + self.quarantine))
+            self._cond.notify()
+
+    @property
+    def in_use(self) -> int:
+        return len(self._in_use)
+
+
+class RSTSuppressor:
+    """포트 범위에서 커널이 보내는 RST 를 막는 iptables 규칙을 설치/제거
+
+    커널은 자신이 모르는 연결의 SYN-ACK/데이터에 ACK 플래그 없는 RST 로 응답한다.
+    측정기가 직접 보내는 RST 는 RST|ACK 이므로 규칙에 걸리지 않는다.
+    """
+
+    def __init__(self, low: int = DEFAULT_PORT_LOW, high: int = DEFAULT_PORT_HIGH, command: str = 'iptables'):
+        self.low = low
+        self.high = high
+        self.command = command
+        self.installed = False
+
+    def _rule(self) -> List[str]:
+        return ['OUTPUT', '-p', 'tcp', '--tcp-flags', 'RST,ACK', 'RST',
+                '--sport', f'{self.low}:{self.high}', '-j', 'DROP']
+
+    def _run(self, action: str) -> bool:
+        try:
+            proc = subprocess.run([self.command, action] + self._rule(), stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            logger.error(f"{self.command} 실행 실패: {e}")
+            return False
+        if proc.returncode != 0 and action != '-C':
+            logger.error(f"{self.command} {action} 실패: {proc.stderr.strip()}")
+        return proc.returncode == 0
+
+    def install(self) -> bool:
+        if shutil.which(self.command) is None:
+            logger.warning(f"{self.command} 를 찾을 수 없어 RST 차단 규칙을 설치하지 않습니다")
+            return False
+        if self._run('-C'):
+            logger.info(f"RST 차단 규칙이 이미 존재합니다: sport {self.low}:{self.high}")
+            return True
+        self.installed = self._run('-I')
+        if self.installed:
+            logger.info(f"RST 차단 규칙 설치: sport {self.low}:{self.high}")
+        return self.installed
+
+    def remove(self):
+        # 직접 설치한 규칙만 제거
+        if self.installed and self._run('-D'):
+            logger.info(f"RST 차단 규칙 제거: sport {self.low}:{self.high}")
+        self.installed = False
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.remove()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+import time
+import threading
+import logging
+import ipaddress
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from scapy.all import IP, IPv6, TCP, AsyncSniffer, conf
+
+logger = logging.getLogger(__name__)
+
+# (원격 IP, 원격 포트, 로컬 포트)
+FlowKey = Tuple[str, int, int]
+
+
+def ip_version(ip_addr: str) -> int:
+    """주소 문자열의 IP 버전 (4/6), 주소가 아니면 0"""
+    try:
+        return ipaddress.ip_address(ip_addr.strip()).version
+    except ValueError:
+        return 0
+
+
+def canonical_ip(ip_addr: str) -> str:
+    """캡처한 패킷의 src 와 같은 표기로 정규화 (IPv6 는 소문자 축약형)"""
+    return ipaddress.ip_address(ip_addr.strip()).compressed
+
+
+def ip_header(dst: str, ecn: int = 0, ttl: Optional[int] = None, src: Optional[str] = None):
+    """dst 주소족에 맞는 IP/IPv6 헤더 (ECN 비트는 TOS 또는 traffic class 에 설정, src 가 없으면 라우팅에 맡김)"""
+    if ':' in dst:
+        pkt = IPv6(dst=dst, tc=ecn)
+        if ttl is not None:
+            pkt.hlim = ttl
+    else:
+        pkt = IP(dst=dst, tos=ecn)
+        if ttl is not None:
+            pkt.ttl = ttl
+    if src:
+        pkt.src = src
+    return pkt
+
+
+def net_layer(packet):
+    """패킷의 (바깥쪽) IP 또는 IPv6 헤더, 없으면 None"""
+    if IP in packet:
+        return packet[IP]
+    if IPv6 in packet:
+        return packet[IPv6]
+    return None
+
+
+def ip_ecn(layer) -> int:
+    """IPv4 TOS 또는 IPv6 traffic class 의 ECN 비트"""
+    return (layer.tc if isinstance(layer, IPv6) else layer.tos) & 0x3
+
+
+def tcp_ace(tcp) -> int:
+    """TCP 헤더의 ACE 필드 (AE, CWR, ECE 3비트, AE 가 최상위)"""
+    return (int(tcp.flags) >> 6) & 0x7
+
+
+def seq_advance(current: int, new: int) -> int:
+    """32비트 시퀀스 번호 중 더 앞선 값 (RFC 1982 serial number 비교, current 가 0 이면 아직 값이 없음)
+
+    시퀀스 번호는 2^32 에서 0 으로 돌아가므로 max() 로 비교하면 wrap 이후 값이 갱신되지 않는다.
+    """
+    if not current or ((new - current) & 0xffffffff) < 0x80000000:
+        return new
+    return current
+
+
+def ace_negotiation(ace: int) -> str:
+    """AE|CWR|ECE SYN 에 대한 SYN-ACK 의 ACE 값 해석 (RFC 9768)
+
+    000: ECN 미지원, 001: 고전 ECN (RFC 3168), 111: SYN 플래그를 그대로 반사하는 비정상 서버,
+    그 외: AccECN (ACE 에 서버가 받은 SYN 의 ECN 코드포인트가 담김)
+    """
+    if ace == 0b000:
+        return 'notECN'
+    if ace == 0b001:
+        return 'ECN'
+    if ace == 0b111:
+        return 'broken'
+    return 'AccECN'
+
+
+class FlowState:
+    """단일 TCP 흐름의 상태값 (ecn.py Sniffer 의 seq/ack/lock/ecnon/flags)"""
+
+    def __init__(self, key: FlowKey):
+        self.key = key
+        self.seq = 0
+        self.ack = 0
+        self.lock = 0
+        self.ecnon = 0
+        self.flags = 0
+        self.synack = None
+        self.next_ack = 0
+        # accecn: SYN 에 AE 를 함께 설정한 흐름 (SYN-ACK 의 ACE 로 협상 판정)
+        self.accecn = False
+        # 이 흐름을 보낸 측정 출발지 (엔진이 등록 시 설정)
+        self.source = None
+        self.synack_ace = 0
+        self.synack_ecn = 0
+        # 데이터 세그먼트별 ECN 코드포인트 수 [Not-ECT, ECT(1), ECT(0), CE]
+        self.ecn_counts = [0, 0, 0, 0]
+        self.syn_time = 0.0
+        self.synack_time = 0.0
+        self.synack_event = threading.Event()
+        self.data_event = threading.Event()
+        self.fin_event = threading.Event()
+        # 상태 변경 시 호출되는 콜백 (asyncio 엔진이 이벤트 루프로 전달하는 용도)
+        self.listener = None
+
+    def _notify(self, kind: str):
+        if self.listener is not None:
+            self.listener(kind)
+
+    @property
+    def rtt(self) -> float:
+        """SYN 전송부터 SYN-ACK 수신까지의 시간 (측정 전이면 0)"""
+        if self.syn_time and self.synack_time:
+            return self.synack_time - self.syn_time
+        return 0.0
+
+    def handle(self, packet):
+        tcp = packet[TCP]
+        ecn_bits = ip_ecn(net_layer(packet))
+
+        if tcp.flags.S and tcp.flags.A:
+            # SYN-ACK 에 ECE 가 설정되어 있으면 ECN 협상 성공 (SAE/SAEC)
+            # AccECN 흐름은 ACE 값으로 판정 (고전 ECN 또는 AccECN 이면 협상 성공)
+            self.synack_ace = tcp_ace(tcp)
+            self.synack_ecn = ecn_bits
+            negotiated = ace_negotiation(self.synack_ace) in ('ECN', 'AccECN') if self.accecn else tcp.flags.E
+            if self.flags == 0 and negotiated:
+                self.flags = 1
+            self.synack = packet
+            self.synack_time = time.monotonic()
+            self.synack_event.set()
+            self._notify('synack')
+            return
+
+        payload_len = len(tcp.payload)
+        if payload_len > 0:
+            self.ecn_counts[ecn_bits] += 1
+            if self.lock == 0:
+                self.lock = 1
+                self.seq = tcp.seq
+                self.ack = tcp.ack
+            if self.ecnon == 0 and ecn_bits == 2:
+                self.ecnon = 1
+            self.next_ack = seq_advance(self.next_ack, (tcp.seq + payload_len) & 0xffffffff)
+            self.data_event.set()
+            self._notify('data')
+
+        if tcp.flags.F:
+            self.next_ack = seq_advance(self.next_ack, (tcp.seq + payload_len + 1) & 0xffffffff)
+            self.fin_event.set()
+            self._notify('fin')
+
+
+class FlowTable:
+    """진행 중인 흐름들의 상태 테이블"""
+
+    def __init__(self):
+        self._flows: Dict[FlowKey, FlowState] = {}
+        self._lock = Lock()
+
+    def register(self, remote_ip: str, remote_port: int, local_port: int) -> FlowState:
+        key = (remote_ip, remote_port, local_port)
+        flow = FlowState(key)
+        with self._lock:
+            if key in self._flows:
+                raise ValueError(f"이미 등록된 흐름입니다: {key}")
+            self._flows[key] = flow
+        return flow
+
+    def unregister(self, flow: FlowState):
+        with self._lock:
+            self._flows.pop(flow.key, None)
+
+    def lookup(self, key: FlowKey) -> Optional[FlowState]:
+        # dict 조회는 GIL 하에서 원자적이므로 수신 경로에서는 락을 잡지 않음
+        return self._flows.get(key)
+
+    def __len__(self):
+        return len(self._flows)
+
+
+class DemuxSniffer:
+    """인터페이스당 하나의 캡처 루프로 모든 흐름의 패킷을 분배하는 스니퍼"""
+
+    def __init__(self, interface: Optional[str] = None, bpf: str = "tcp"):
+        self.interface = interface or conf.iface
+        self.bpf = bpf
+        self.flows = FlowTable()
+        self.ready = threading.Event()
+        self.received = 0
+        self.dispatched = 0
+        self._sniffer = None
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """캡처를 시작하고 소켓이 준비될 때까지 대기"""
+        if self._sniffer is not None:
+            return self.ready.is_set()
+        # 고정 sleep 대신 캡처 소켓이 실제로 열린 시점(started_callback)까지 대기
+        self._sniffer = AsyncSniffer(iface=self.interface, filter=self.bpf, prn=self.dispatch,
+                                     store=False, started_callback=self.ready.set)
+        self._sniffer.start()
+        if not self.ready.wait(timeout):
+            logger.error(f"캡처 소켓 준비 실패: {self.interface}")
+            return False
+        logger.info(f"공유 스니퍼 시작: {self.interface} (filter: {self.bpf})")
+        return True
+
+    def stop(self):
+        if self._sniffer is not None and self._sniffer.running:
+            self._sniffer.stop()
+        self._sniffer = None
+        self.ready.clear()
+
+    def dispatch(self, packet):
+        """(원격 IP, 원격 포트, 로컬 포트) 로 흐름을 찾아 패킷 전달"""
+        self.received += 1
+        layer = net_layer(packet)
+        if layer is None or TCP not in packet:
+            return
+        tcp = packet[TCP]
+        flow = self.flows.lookup((layer.src, tcp.sport, tcp.dport))
+        if flow is not None:
+            self.dispatched += 1
+            flow.handle(packet)
+
+    def register(self, remote_ip: str, remote_port: int, local_port: int) -> FlowState:
+        return self.flows.register(remote_ip, remote_port, local_port)
+
+    def unregister(self, flow: FlowState):
+        self.flows.unregister(flow)
+
+
+_sniffers: Dict[str, DemuxSniffer] = {}
+_sniffers_lock = Lock()
+
+
+def get_demux_sniffer(interface: Optional[str] = None, bpf: str = "tcp") -> DemuxSniffer:
+    """(인터페이스, 필터)별 공유 스니퍼를 반환 (없으면 생성 후 시작)"""
+    interface = interface or conf.iface
+    key = f"{interface}|{bpf}"
+    with _sniffers_lock:
+        sniffer = _sniffers.get(key)
+        if sniffer is None:
+            sniffer = DemuxSniffer(interface, bpf)
+            if not sniffer.start():
+                sniffer.stop()
+                raise RuntimeError(f"캡처 소켓을 열 수 없습니다: {interface}")
+            _sniffers[key] = sniffer
+        return sniffer
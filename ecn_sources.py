@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import time
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from ecn_sniffer import canonical_ip, ip_version
+
+
+class RateBudget:
+    """출발지별 초당 새 프로브 수 제한 (스레드/asyncio 공용)
+
+    reserve() 는 다음 전송 슬롯을 예약하고 그때까지 기다릴 시간을 반환하므로
+    스레드는 time.sleep, 코루틴은 asyncio.sleep 으로 기다린다.
+    """
+
+    def __init__(self, rate: float = 0.0):
+        self.rate = rate
+        self._next_send = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_send - now)
+            self._next_send = max(now, self._next_send) + 1.0 / self.rate
+        return delay
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class ProbeSource:
+    """측정 출발지: 공인 주소, 송수신 인터페이스, 초당 새 프로브 수
+
+    address 가 비어 있으면 커널 라우팅이 출발지 주소를 정한다 (기존 단일 출발지 동작).
+    rate 가 0 이면 엔진의 기본 rate 를 사용한다.
+    """
+    address: str = ''
+    interface: Optional[str] = None
+    rate: float = 0.0
+    # 엔진이 측정 중에 채우는 출발지별 자원 (캡처 소켓, 주소족별 L3 송신 소켓, 전송 예산)
+    budget: RateBudget = field(default_factory=RateBudget, repr=False)
+    sniffer: Any = field(default=None, repr=False)
+    l3socket: Any = field(default=None, repr=False)
+    l3socket6: Any = field(default=None, repr=False)
+
+    @property
+    def name(self) -> str:
+        return self.address or 'default'
+
+
+def parse_source(value: str) -> ProbeSource:
+    """'ADDR[@IFACE][/RATE]' 형식의 출발지 파싱 (예: 203.0.113.5@eth1/300, 2001:db8::5@eth2)"""
+    spec, _, rate = value.partition('/')
+    address, _, interface = spec.partition('@')
+    if not ip_version(address):
+        raise argparse.ArgumentTypeError(f"잘못된 출발지 주소: {address}")
+    try:
+        return ProbeSource(address=canonical_ip(address), interface=interface or None,
+                           rate=float(rate) if rate else 0.0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"잘못된 출발지 rate: {rate}")
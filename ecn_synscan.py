@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import hmac
+import struct
+import socket
+import hashlib
+import ipaddress
+import argparse
+import logging
+import threading
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+from requests import RequestException, get
+from scapy.all import IPv6, TCP, AsyncSniffer, conf, get_if_addr
+from ecn_sniffer import canonical_ip, ip_header, ip_version, net_layer
+from ecn_portpool import DEFAULT_PORT_LOW, DEFAULT_PORT_HIGH
+from batch_io import BatchSender
+import tcppacket as rs
+
+# 로깅 설정
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('ecn_synscan.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+INVALID_VALUES = ["", "N/A", "NULL", "NONE", "UNDEFINED"]
+
+# SYN(ECE|CWR) 플래그 ([HS,CWR,ECE,URG,ACK,PSH,RST,SYN,FIN]) 와 MSS 1460 옵션
+SYN_ECN_FLAGS = (0, 1, 1, 0, 0, 0, 0, 1, 0)
+MSS_OPTION = struct.pack('!BBH', 2, 4, 1460)
+
+
+class SynCookie:
+    """대상 정보를 시퀀스 번호/출발지 포트에 인코딩하여 상태 없이 응답을 검증
+
+    출발지 포트는 ecn_portpool 과 같은 ephemeral 범위 밖의 포트(61000-65535)를 사용하므로
+    커널 소켓과 충돌하지 않고 같은 RST 차단 규칙이 적용된다.
+    """
+
+    def __init__(self, secret: Optional[bytes] = None, port_base: int = DEFAULT_PORT_LOW,
+                 port_count: int = DEFAULT_PORT_HIGH - DEFAULT_PORT_LOW + 1):
+        self.secret = secret or os.urandom(16)
+        self.port_base = port_base
+        self.port_count = port_count
+
+    def _digest(self, ip_addr: str, dport: int) -> bytes:
+        family = socket.AF_INET6 if ':' in ip_addr else socket.AF_INET
+        msg = socket.inet_pton(family, ip_addr) + struct.pack('!H', dport)
+        return hmac.new(self.secret, msg, hashlib.blake2s).digest()
+
+    def encode(self, ip_addr: str, dport: int) -> Tuple[int, int]:
+        """(출발지 포트, 시퀀스 번호) 반환"""
+        digest = self._digest(ip_addr, dport)
+        seq, port_hash = struct.unpack('!IH', digest[:6])
+        return self.port_base + port_hash % self.port_count, seq
+
+    def validate(self, ip_addr: str, remote_port: int, local_port: int, ack: int) -> bool:
+        """SYN-ACK/RST 의 ack 가 우리가 보낸 SYN 의 seq+1 인지 확인"""
+        sport, seq = self.encode(ip_addr, remote_port)
+        return sport == local_port and ack == (seq + 1) & 0xffffffff
+
+
+def iter_target_ips(list_file: str) -> Iterator[str]:
+    """대상 파일을 한 줄씩 읽어 IP 주소를 반환 (전체 파일을 메모리에 올리지 않음)
+
+    지원 형식: 'ip' 또는 'rank,domain,ip' (IPv4/IPv6)
+    """
+    with open(list_file, "r") as f:
+        for line in f:
+            item = line.strip().split(',')
+            ip_addr = item[2] if len(item) >= 3 else item[0]
+            ip_addr = ip_addr.strip()
+            if ip_addr.upper() in INVALID_VALUES or not ip_version(ip_addr):
+                continue
+            yield canonical_ip(ip_addr)
+
+
+class StatelessSynScanner:
+    """zmap 방식의 상태 없는 ECN 협상 스캐너 (SYN(ECE|CWR) 만 전송)"""
+
+    def __init__(self, output_file: str, rate: float = 10000.0, dports: Iterable[int] = (80,), cooldown: float = 5.0,
+                 interface: Optional[str] = None, cookie: Optional[SynCookie] = None, dedup: bool = True,
+                 callback: Optional[Callable[[str, str, int], None]] = None, source_ip: Optional[str] = None,
+                 templates: bool = True, batch: int = 64):
+        self.output_file = output_file
+        self.rate = rate
+        self.dports = list(dports)
+        self.cooldown = cooldown
+        self.interface = interface or conf.iface
+        self.cookie = cookie or SynCookie()
+        self.dedup = dedup
+        self.callback = callback
+        # IPv4 SYN 은 포트별 바이트 템플릿을 한 번 만들고 dst/포트/seq 와 체크섬만 바꿔 raw 소켓으로 전송
+        # (TCP 체크섬에 출발지 주소가 필요하므로 인터페이스 주소를 모르면 scapy 경로 사용)
+        self.source_ip = source_ip or get_if_addr(self.interface)
+        self.templates = templates and self.source_ip not in ('', '0.0.0.0')
+        self._syn_templates = {}
+        # batch > 1 이면 템플릿 SYN 을 모아 sendmmsg 한 번에 최대 batch 개씩 전송
+        self.batch = batch
+        self.send_calls = 0
+        self.seen = set()
+        self.sent = 0
+        self.received = 0
+        self.invalid = 0
+        self.counts = {'SAE': 0, 'notSAE': 0, 'RST': 0}
+        self.write_lock = Lock()
+        self._out = None
+
+    def _bpf(self) -> str:
+        low = self.cookie.port_base
+        high = self.cookie.port_base + self.cookie.port_count - 1
+        src_ports = ' or '.join(f"src port {port}" for port in self.dports)
+        # tcp[] 접근은 IPv4 에만 적용되므로 IPv6 응답은 플래그 검사 없이 통과시킴 (쿠키로 검증)
+        return (f"tcp and ({src_ports}) and dst portrange {low}-{high} and "
+                f"(ip6 or tcp[tcpflags] & (tcp-syn|tcp-ack) == (tcp-syn|tcp-ack) or tcp[tcpflags] & tcp-rst != 0)")
+
+    def handle_reply(self, packet):
+        """응답 패킷을 쿠키로 검증한 뒤 결과를 바로 출력 파일에 기록"""
+        ip_layer = net_layer(packet)
+        if ip_layer is None or TCP not in packet:
+            return
+        tcp = packet[TCP]
+        if not self.cookie.validate(ip_layer.src, tcp.sport, tcp.dport, tcp.ack):
+            self.invalid += 1
+            return
+
+        if self.dedup:
+            key = (int(ipaddress.ip_address(ip_layer.src)) << 16) | tcp.sport
+            if key in self.seen:
+                return
+            self.seen.add(key)
+
+        if tcp.flags.R:
+            label = 'RST'
+        elif tcp.flags.E:
+            label = 'SAE'
+        else:
+            label = 'notSAE'
+        self.received += 1
+        self.counts[label] += 1
+
+        # IPv6 는 traffic class 와 hop limit 을 같은 열에 기록
+        if isinstance(ip_layer, IPv6):
+            tos, ttl = ip_layer.tc, ip_layer.hlim
+        else:
+            tos, ttl = ip_layer.tos, ip_layer.ttl
+        line = f"{label},{ip_layer.src},{tcp.sport},{tcp.flags},{tos},{ttl},{time.time():.6f}\n"
+        with self.write_lock:
+            self._out.write(line)
+        if self.callback is not None:
+            self.callback(label, ip_layer.src, tcp.sport)
+
+    def _syn_template(self, dport: int) -> rs.ProbeTemplate:
+        """목적지 포트별 IPv4 SYN(ECE|CWR) 템플릿"""
+        template = self._syn_templates.get(dport)
+        if template is None:
+            template = rs.tcp_template(self.source_ip, '0.0.0.0', self.cookie.port_base, dport,
+                                       flags=SYN_ECN_FLAGS, options=MSS_OPTION)
+            self._syn_templates[dport] = template
+        return template
+
+    def _raw_socket(self) -> socket.socket:
+        """IP 헤더를 직접 채운 IPv4 패킷을 보내는 raw 소켓 (IPPROTO_RAW 는 IP_HDRINCL 포함)"""
+        raw = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+        if self.interface:
+            raw.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, str(self.interface).encode())
+        return raw
+
+    def _send_all(self, ips: Iterator[str]):
+        """초당 rate 개의 속도로 모든 (IP, 포트)에 SYN(ECE|CWR) 전송 (IPv6 는 별도 L3 소켓)"""
+        raw = self._raw_socket() if self.templates else None
+        sender = BatchSender(raw, self.batch) if raw is not None and self.batch > 1 else None
+        l3socket = None if self.templates else conf.L3socket(iface=self.interface)
+        l3socket6 = None
+        interval = 1.0 / self.rate if self.rate > 0 else 0
+        next_send = time.monotonic()
+        try:
+            for ip_addr in ips:
+                for dport in self.dports:
+                    sport, seq = self.cookie.encode(ip_addr, dport)
+                    if raw is not None and ':' not in ip_addr:
+                        template = self._syn_template(dport)
+                        template.set_dst(ip_addr)
+                        template.set_ports(srcp=sport)
+                        template.set_seq(seq)
+                        if sender is None:
+                            raw.sendto(template.packet(), (ip_addr, 0))
+                            self.send_calls += 1
+                        elif sender.queue(template.packet()):
+                            # 템플릿 바이트는 queue 에서 송신 슬롯으로 복사되므로 바로 다음 SYN 에 재사용
+                            sender.flush()
+                    else:
+                        packet = ip_header(ip_addr) / TCP(sport=sport, dport=dport, flags='SEC', seq=seq,
+                                                          options=[('MSS', 1460)])
+                        if ':' in ip_addr:
+                            if l3socket6 is None:
+                                l3socket6 = conf.L3socket6(iface=self.interface)
+                            l3socket6.send(packet)
+                        else:
+                            l3socket.send(packet)
+                    self.sent += 1
+                    if interval:
+                        next_send += interval
+                        delay = next_send - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    if self.sent % 100000 == 0:
+                        logger.info(f"전송: {self.sent}, 응답: {self.received}")
+            if sender is not None:
+                sender.flush()
+        finally:
+            if sender is not None:
+                self.send_calls += sender.calls
+            if raw is not None:
+                raw.close()
+            if l3socket is not None:
+                l3socket.close()
+            if l3socket6 is not None:
+                l3socket6.close()
+
+    def scan(self, ips: Iterator[str]):
+        """전체 스캔 수행: 수신 스니퍼 시작 -> 전송 -> cooldown 후 종료"""
+        ready = threading.Event()
+        self._out = open(self.output_file, 'a', buffering=1024 * 1024)
+        sniffer = AsyncSniffer(iface=self.interface, filter=self._bpf(), prn=self.handle_reply, store=False,
+                               started_callback=ready.set)
+        sniffer.start()
+        ready.wait(5)
+        start_time = time.time()
+        try:
+            self._send_all(ips)
+            time.sleep(self.cooldown)
+        finally:
+            sniffer.stop()
+            with self.write_lock:
+                self._out.close()
+        self._print_statistics(time.time() - start_time)
+
+    def _print_statistics(self, elapsed: float):
+        logger.info("=" * 60)
+        logger.info("SYN 스캔 결과 통계")
+        logger.info("=" * 60)
+        logger.info(f"전송한 SYN: {self.sent}개 ({self.sent/elapsed if elapsed > 0 else 0:.0f} pps)")
+        if self.send_calls:
+            logger.info(f"raw 소켓 송신 시스템 콜: {self.send_calls}회 (호출당 {self.sent / self.send_calls:.1f}개)")
+        logger.info(f"유효한 응답: {self.received}개, 검증 실패: {self.invalid}개")
+        for label, count in self.counts.items():
+            logger.info(f"{label}: {count}개")
+        logger.info(f"결과 파일: {self.output_file}")
+        logger.info("=" * 60)
+
+
+def get_my_ip() -> str:
+    """내 IP 주소를 가져오는 함수 (실패하면 'unknown')"""
+    try:
+        logger.info("내 IP 주소를 확인하는 중...")
+        my_ip = get('https://api.ipify.org', timeout=10).text
+        logger.info(f"내 IP 주소: {my_ip}")
+        return my_ip
+    except RequestException as e:
+        logger.error(f"IP 주소 확인 실패: {e}")
+        return "unknown"
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description='상태 없는 SYN 기반 ECN 협상 스캐너')
+    parser.add_argument('target_list', help='대상 IP 리스트 파일 (ip 또는 rank,domain,ip)')
+    parser.add_argument('--rate', type=float, default=10000.0, help='초당 전송 패킷 수 (기본값: 10000)')
+    parser.add_argument('--ports', default='80', help='목적지 포트 목록, 예: 80,443 (기본값: 80)')
+    parser.add_argument('--cooldown', type=float, default=5.0, help='전송 완료 후 응답 대기 시간 (기본값: 5초)')
+    parser.add_argument('--iface', default=None, help='인터페이스 (기본값: scapy conf.iface)')
+    parser.add_argument('--my-ip', default=None, help='내 공인 IP (지정 시 api.ipify.org 조회 생략)')
+    parser.add_argument('--source-ip', default=None,
+                        help='IPv4 SYN 의 출발지 주소 (기본값: 인터페이스 주소)')
+    parser.add_argument('--no-templates', action='store_true',
+                        help='IPv4 SYN 도 scapy 로 생성 (기본값: 바이트 템플릿 + raw 소켓)')
+    parser.add_argument('--batch', type=int, default=64,
+                        help='sendmmsg 한 번에 보내는 템플릿 SYN 수, 1 은 패킷마다 sendto (기본값: 64)')
+    parser.add_argument('--output-dir', default='ecnserver', help='출력 디렉토리 (기본값: ecnserver)')
+
+    args = parser.parse_args()
+
+    my_ip = args.my_ip or get_my_ip()
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = os.path.join(args.output_dir, f"synscan_{my_ip}_{timestamp}.csv")
+
+    dports = [int(port) for port in args.ports.split(',') if port.strip()]
+    scanner = StatelessSynScanner(output_file, rate=args.rate, dports=dports, cooldown=args.cooldown,
+                                  interface=args.iface, source_ip=args.source_ip,
+                                  templates=not args.no_templates, batch=args.batch)
+    try:
+        scanner.scan(iter_target_ips(args.target_list))
+    except KeyboardInterrupt:
+        logger.info("사용자에 의해 중단되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+import os
+import time
+import socket
+import struct
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 바이너리 세그먼트 형식
+# 파일 헤더: magic(4s) + version(H)
+# 레코드: timestamp(d) ip(16s, IPv4 는 ::ffff:a.b.c.d) rank(I) sport(H) dport(H) label(B) flags(B) ecnon(B)
+#         ecn_counts(4I) domain_len(H) + domain(utf-8)
+SEGMENT_MAGIC = b'ECNS'
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('!4sH')
+SEGMENT_RECORD = struct.Struct('!d16sIHHBBB4IH')
+SEGMENT_LABELS = ['SAE-ECN', 'SAE-notECN', 'notSAE-notECN', 'Error']
+
+
+def _pack_ip(ip_addr: str) -> bytes:
+    try:
+        return socket.inet_pton(socket.AF_INET6, ip_addr)
+    except OSError:
+        pass
+    try:
+        return b'\x00' * 10 + b'\xff\xff' + socket.inet_aton(ip_addr)
+    except OSError:
+        return b'\x00' * 16
+
+
+def _unpack_ip(packed: bytes) -> str:
+    if packed == b'\x00' * 16:
+        return 'N/A'
+    if packed[:12] == b'\x00' * 10 + b'\xff\xff':
+        return socket.inet_ntoa(packed[12:])
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+def pack_record(result) -> bytes:
+    """ECNProbeResult 하나를 세그먼트 레코드로 변환"""
+    domain = result.domain.encode('utf-8')[:0xffff]
+    label = SEGMENT_LABELS.index(result.outcome) if result.outcome in SEGMENT_LABELS else len(SEGMENT_LABELS) - 1
+    counts = list(getattr(result, 'ecn_counts', None) or [0, 0, 0, 0])
+    # 숫자가 아닌 순위는 0 으로 기록
+    rank = int(result.rank) if str(result.rank).isdigit() else 0
+    return SEGMENT_RECORD.pack(time.time(), _pack_ip(result.ip), rank & 0xffffffff, result.sport,
+                               result.dport, label, result.flags, result.ecnon, *counts,
+                               len(domain)) + domain
+
+
+def read_segment(file_name: str) -> Iterator[Dict]:
+    """세그먼트 파일의 레코드를 dict 로 하나씩 반환"""
+    with open(file_name, 'rb') as f:
+        magic, version = SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            raise ValueError(f"지원하지 않는 세그먼트 파일: {file_name}")
+        while True:
+            raw = f.read(SEGMENT_RECORD.size)
+            if len(raw) < SEGMENT_RECORD.size:
+                return
+            (timestamp, ip_packed, rank, sport, dport, label, flags, ecnon,
+             c0, c1, c2, c3, domain_len) = SEGMENT_RECORD.unpack(raw)
+            domain = f.read(domain_len).decode('utf-8', 'replace')
+            yield {
+                'timestamp': timestamp,
+                'ip': _unpack_ip(ip_packed),
+                'rank': str(rank) if rank else '',
+                'sport': sport,
+                'dport': dport,
+                'outcome': SEGMENT_LABELS[label],
+                'flags': flags,
+                'ecnon': ecnon,
+                'ecn_counts': [c0, c1, c2, c3],
+                'domain': domain,
+            }
+
+
+class OutcomeWriter:
+    """측정 결과를 메모리에 모았다가 한 번에 기록하는 단일 writer
+
+    파일별 버퍼를 max_records 개 또는 flush_interval 초마다 O_APPEND fd 에 write 한 번으로
+    내보내므로 줄 단위 레코드가 다른 프로세스의 기록과 섞이지 않는다.
+    segment_file 을 지정하면 같은 레코드를 바이너리 세그먼트로도 기록한다.
+    sync 가 True 이면 flush 마다 fsync 하여 크래시 후에도 기록이 남도록 한다.
+    """
+
+    def __init__(self, max_records: int = 1000, flush_interval: float = 1.0, segment_file: Optional[str] = None,
+                 sync: bool = False):
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self.segment_file = segment_file
+        self.sync = sync
+        self._buffers: Dict[str, List[bytes]] = {}
+        self._journal: Dict[str, List[bytes]] = {}
+        self._pending = 0
+        self._fds: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _fd(self, file_name: str) -> int:
+        fd = self._fds.get(file_name)
+        if fd is None:
+            fd = os.open(file_name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if file_name == self.segment_file and os.fstat(fd).st_size == 0:
+                os.write(fd, SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION))
+            self._fds[file_name] = fd
+        return fd
+
+    def _start_flusher(self):
+        if self._flusher is None and self.flush_interval > 0:
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _append(self, file_name: str, record: bytes):
+        self._buffers.setdefault(file_name, []).append(record)
+
+    def write(self, file_name: str, line: str, result=None, journal: Optional[Tuple[str, str]] = None):
+        """텍스트 한 줄(과 세그먼트 레코드, 저널 줄)을 버퍼에 추가
+
+        journal 은 (저널 파일, 줄) 이며 같은 flush 안에서 결과 파일보다 나중에 기록된다.
+        """
+        with self._lock:
+            self._append(file_name, line.encode('utf-8'))
+            if self.segment_file and result is not None:
+                self._append(self.segment_file, pack_record(result))
+            if journal is not None:
+                self._journal.setdefault(journal[0], []).append(journal[1].encode('utf-8'))
+            self._pending += 1
+            full = self._pending >= self.max_records
+            self._start_flusher()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """버퍼의 레코드를 파일별로 한 번의 write 로 기록"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            journal, self._journal = self._journal, {}
+            self._pending = 0
+            self._write_all(buffers)
+            # 결과가 디스크에 기록된 뒤에 저널에 완료 표시
+            self._write_all(journal)
+
+    def _write_all(self, buffers: Dict[str, List[bytes]]):
+        for file_name, records in buffers.items():
+            data = memoryview(b''.join(records))
+            fd = self._fd(file_name)
+            while data:
+                written = os.write(fd, data)
+                data = data[written:]
+        if self.sync:
+            for file_name in buffers:
+                os.fsync(self._fds[file_name])
+
+    def close(self):
+        """남은 레코드를 기록하고 파일을 닫음 (이후 write 하면 다시 연다)"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -21,11 +21,16 @@ result_file_name = 'ecnserver/result_'+str(MyIP)+'.txt'
 revise_file_name = 'ecnserver/revise_'+str(MyIP)+'.txt'
 debug_file_name = 'ecnserver/debug_'+str(MyIP)+'_www.txt'
 
+debug_file = None
+
 def log_debug(message):
     """Write a debug message to the debug file with timestamp"""
+    global debug_file
+    # open the debug file once; line buffering writes each message without reopening the file
+    if debug_file is None:
+        debug_file = open(debug_file_name, 'a', buffering=1)
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-    with open(debug_file_name, 'a') as f:
-        f.write(f'[{timestamp}] {message}\n')
+    debug_file.write(f'[{timestamp}] {message}\n')
 
 class Sniffer(threading.Thread):
     def  __init__(self, interface=None):
@@ -47,20 +52,21 @@ class Sniffer(threading.Thread):
         self.lock = 0
         self.ecnon = 0
         self.flags = 0
+        self.ready = threading.Event()
         log_debug(f"available interfaces: {available_ifaces}")
         log_debug(f"default interface: {default_iface}")
         log_debug(f'init sniffer destip: {destip}, flags = {self.flags}, seq: {self.seq}, ack = {self.ack}, lock = {self.lock}, ecnon = {self.ecnon}')
 
     def run(self):
         try:
-            sniff(iface=self.interface, filter="tcp port 80", prn=self.print_packet, store=0)
+            sniff(iface=self.interface, filter="tcp port 80", prn=self.print_packet, store=0, started_callback=self.ready.set)
         finally: 
             print('ended') 
 
     def print_packet(self, packet):
         ip_layer = packet.getlayer(IP)
         if IP in packet and packet[IP].src == destip: #who-has or is-at
-            ecn_bits = packet[IP].tos & 0xf
+            ecn_bits = packet[IP].tos & 0x3
             tmp_flag = str(packet[TCP].flags)
             # print(tmp_flag)
             if self.flags == 0:
@@ -94,7 +100,8 @@ def run_one_ecn(domain_name):
         log_debug(f"Start sniffing... with {domain_name}")
         sniffer.start()
 
-        time.sleep(2)
+        # wait until the capture socket is open instead of a fixed sleep
+        sniffer.ready.wait(2)
 
         syn = IP(dst=domain_name) / TCP(dport=dport, flags='SEC', seq=seqnum, options=[('MSS',1460)])
         syn_ack = sr1(syn, verbose=False, timeout=2)
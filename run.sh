@@ -14,18 +14,22 @@ mkdir ecnserver
 # done
 # done
 
-fx=`cat filelist_server.txt`
-for filename in $fx
-do
-echo "$filename"
-fx2=`cat $filename`
-for filename_2 in $fx2
-do
-fx3=`echo $filename_2 | cut -f2 -d ','`
-echo "$fx3"
-python3 ecn_www.py $fx3
-pkill -9 python3
-done
-done
+# fx=`cat filelist_server.txt`
+# for filename in $fx
+# do
+# echo "$filename"
+# fx2=`cat $filename`
+# for filename_2 in $fx2
+# do
+# fx3=`echo $filename_2 | cut -f2 -d ','`
+# echo "$fx3"
+# python3 ecn_www.py $fx3
+# pkill -9 python3
+# done
+# done
+
+# all targets are probed by one long-lived process (no per-domain python3 / pkill)
+# the journal lets a restarted run skip the (domain, port) pairs that already have a result
+python3 ecn_batch.py --filelist filelist_server.txt --www --journal ecnserver/journal_www.txt
 
 echo "Finishing the web-server measurement, Thank you."
\ No newline at end of file
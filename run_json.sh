@@ -1,26 +1,31 @@
 echo "Starting ECN web-server measurement using input file : filelist_server.txt";
 mkdir ecnserver
-fx2=`cat web_300000_json.txt`
-for filename_2 in $fx2
-do
-echo "$filename_2" 
-python3 ecn_json.py $filename_2
-pkill -9 python3
-done
-done
+# fx2=`cat web_300000_json.txt`
+# for filename_2 in $fx2
+# do
+# echo "$filename_2" 
+# python3 ecn_json.py $filename_2
+# pkill -9 python3
+# done
+# done
+
+# ecn_json.py streams the NDJSON file itself (domain / dip / rank fields) into one batch prober,
+# so the awk-extracted web_300000_json.txt and the per-line python3 launches are no longer needed;
+# the journal lets a restarted node continue where it stopped
+python3 ecn_json.py web_300000.ndjson --journal ecnserver/journal_json.txt
 
 # awk 'BEGIN {FS="\"";OFS=","} {print $8,$12}' test.txt > test_2.txt
 
-awk 'BEGIN {FS="\"";OFS=","} $12 == "^[[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}]" {print $0}' test.ndjson
-test.ndjson | awk '{match($0,/[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+/); ip = substr($0,RSTART,RLENGTH); print ip}'
-cat test.csv | awk '$12 == "^[[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}]" { print $0 }'
-awk '{match($0,/[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+/); print $0}' test.ndjson
+# awk 'BEGIN {FS="\"";OFS=","} $12 == "^[[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}]" {print $0}' test.ndjson
+# test.ndjson | awk '{match($0,/[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+/); ip = substr($0,RSTART,RLENGTH); print ip}'
+# cat test.csv | awk '$12 == "^[[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}\.[0-9]\{1,3\}]" { print $0 }'
+# awk '{match($0,/[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+/); print $0}' test.ndjson
 
-awk -F\" '{print $12}'  test.ndjson
-awk -F'\"' '$12 ~ /^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}/ {print}' test.ndjson
-cat test.ndjson | awk -F'\"' '$12 {print $12}'
-awk -F'\"' '$12 ~ /^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}/ {print $0}' test.ndjson
-awk -F'\"' '$12 ~ /\([0-9.]\+\)\s.*/\1/p/ {print $12}'
+# awk -F\" '{print $12}'  test.ndjson
+# awk -F'\"' '$12 ~ /^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}/ {print}' test.ndjson
+# cat test.ndjson | awk -F'\"' '$12 {print $12}'
+# awk -F'\"' '$12 ~ /^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}/ {print $0}' test.ndjson
+# awk -F'\"' '$12 ~ /\([0-9.]\+\)\s.*/\1/p/ {print $12}'
 
 # sed -E 's/\},\s*\{/\},\n\{/g' test.ndjson | grep  '"domain" : '
 # sed -E 's/\},\s*\{/\},\n\{/g' test.ndjson
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import socket, sys, struct, os, binascii
+from collections import namedtuple
 # from netaddr import IPNetwork, IPAddress
 from ctypes import *
 
@@ -54,6 +55,44 @@ def checksum(msg):
     return s
 
 
+"""
+Internet checksum (RFC 1071) of a whole buffer (bytes, bytearray or memoryview, no copy).
+Unlike checksum(), the result is in network byte order: pack it with '!H'.
+The buffer is read as one big-endian integer; since 2**16 == 1 (mod 0xffff) its remainder
+mod 0xffff is the ones' complement sum of the 16-bit words, computed in C instead of a
+Python loop. A non-zero buffer whose sum is a multiple of 0xffff sums to 0xffff (-0).
+"""
+
+
+def fast_checksum(msg):
+    value = int.from_bytes(msg, 'big')
+    if len(msg) % 2 == 1:
+        value <<= 8  # pad the odd trailing byte with a zero low byte
+    s = value % 0xffff
+    if s == 0 and value:
+        s = 0xffff
+    return ~s & 0xffff
+
+
+"""
+Incremental checksum update (RFC 1624, eqn. 3): HC' = ~(~HC + ~m + m')
+check = current checksum field (network order), old/new = 16-bit word before/after the change.
+checksum_update32 does the same for a 32-bit field (address, seq, ack) as two words.
+"""
+
+
+def checksum_update(check, old, new):
+    s = (~check & 0xffff) + (~old & 0xffff) + new
+    s = (s & 0xffff) + (s >> 16)
+    s = (s & 0xffff) + (s >> 16)
+    return ~s & 0xffff
+
+
+def checksum_update32(check, old, new):
+    check = checksum_update(check, old >> 16, new >> 16)
+    return checksum_update(check, old & 0xffff, new & 0xffff)
+
+
 """
 Construct an IP header.
 For a TCP packet, only source and destination IPs need to be set.
@@ -126,16 +165,20 @@ def construct_tcp_header(source_ip, dest_ip, srcp, dstp, seq, ackno, flags, user
     tcp_psh = flags[5]
     tcp_ack = flags[4]
     tcp_urg = flags[3]
-    tcp_window = socket.htons(wsize)  # maximum allowed window size
+    tcp_ece = flags[2]
+    tcp_cwr = flags[1]
+    tcp_hs = flags[0]
+    tcp_window = wsize  # maximum allowed window size (packed in network order below)
     tcp_check = 0
     tcp_urg_ptr = urgptr
 
-    tcp_offset_res = (tcp_doff << 4) + 0
-    tcp_flags = tcp_fin + (tcp_syn << 1) + (tcp_rst << 2) + (tcp_psh << 3) + (tcp_ack << 4) + (tcp_urg << 5)
+    tcp_offset_res = (tcp_doff << 4) + tcp_hs
+    tcp_flags = tcp_fin + (tcp_syn << 1) + (tcp_rst << 2) + (tcp_psh << 3) + (tcp_ack << 4) + (tcp_urg << 5) + \
+        (tcp_ece << 6) + (tcp_cwr << 7)
 
     # the ! in the pack format string means network order
-    tcp_header = struct.pack('!HHLLBBHHH', tcp_source, tcp_dest, tcp_seq, tcp_ack_seq, tcp_offset_res, tcp_flags,
-                             tcp_window, tcp_check, tcp_urg_ptr)
+    tcp_header = bytearray(struct.pack('!HHLLBBHHH', tcp_source, tcp_dest, tcp_seq, tcp_ack_seq, tcp_offset_res,
+                                       tcp_flags, tcp_window, tcp_check, tcp_urg_ptr))
     # print(tcp_header)
     # pseudo header fields
     source_address = socket.inet_aton(source_ip)
@@ -149,12 +192,11 @@ def construct_tcp_header(source_ip, dest_ip, srcp, dstp, seq, ackno, flags, user
     # print(psh)
     psh = psh + tcp_header + user_data
     # print('psh : ', psh, ' tcp_header :', tcp_header, ' user_data :', user_data)
-    tcp_check = checksum(psh)
+    tcp_check = fast_checksum(psh)
 
-    # make the tcp header again and fill the correct checksum
-    tcp_header = struct.pack('!HHLLBBH', tcp_source, tcp_dest, tcp_seq, tcp_ack_seq, tcp_offset_res, tcp_flags,
-                             tcp_window) + struct.pack('H', tcp_check) + struct.pack('!H', tcp_urg_ptr)
-    return tcp_header
+    # fill the correct checksum in place
+    struct.pack_into('!H', tcp_header, 16, tcp_check)
+    return bytes(tcp_header)
 
 def construct_data_payload(magic, tos):
     payload = struct.pack('!HH', magic, tos)
@@ -172,6 +214,212 @@ def construct_tcp_packet(ip_header, tcp_header, user_data=""):
     return packet
 
 
+"""
+Construct a UDP header.
+source_ip = str IP of sender
+dest_ip   = str IP of receiver
+srcp      = source port number
+dstp      = receiver port number
+user_data = bytes with the data to send
+"""
+
+
+def construct_udp_header(source_ip, dest_ip, srcp, dstp, user_data=b""):
+    udp_length = 8 + len(user_data)
+    udp_header = struct.pack('!HHHH', srcp, dstp, udp_length, 0)
+
+    # pseudo header fields
+    psh = struct.pack('!4s4sBBH', socket.inet_aton(source_ip), socket.inet_aton(dest_ip), 0, socket.IPPROTO_UDP,
+                      udp_length)
+    udp_check = fast_checksum(psh + udp_header + user_data) or 0xffff  # 0 means "no checksum" for UDP
+
+    return udp_header[:6] + struct.pack('!H', udp_check)
+
+
+"""
+Pre-built probe packet (IPv4 header + TCP/UDP header + payload) kept in a bytearray.
+The bytes and both checksums are computed once from construct_ip_header/construct_tcp_header/
+construct_udp_header; afterwards only the fields that change between probes (dst, ttl, tos, id,
+ports, seq, ack) are patched in place and the IP and TCP/UDP checksums adjusted with
+checksum_update (RFC 1624), so a probe costs O(1) whatever its payload length.
+packet() returns the buffer, which can be passed to sendto() on a SOCK_RAW/IPPROTO_RAW socket as is.
+The buffer is reused by the next probe, so one template must not be shared between threads.
+"""
+
+IP_TOS = 1
+IP_TOT_LEN = 2
+IP_ID = 4
+IP_TTL = 8
+IP_CHECK = 10
+IP_SRC = 12
+IP_DST = 16
+
+
+class ProbeTemplate(object):
+    def __init__(self, ip_header, l4_header, user_data=b""):
+        self.buf = bytearray(ip_header + l4_header + user_data)
+        self.ihl = (self.buf[0] & 0x0f) * 4
+        self.proto = self.buf[9]
+        self.l4 = self.ihl
+        self.l4_check = self.l4 + (16 if self.proto == socket.IPPROTO_TCP else 6)
+        # the kernel only fills length/checksum for IP_HDRINCL sockets, set them so the bytes are complete
+        struct.pack_into('!H', self.buf, IP_TOT_LEN, len(self.buf))
+        self._full_checksums()
+
+    def _full_checksums(self):
+        struct.pack_into('!H', self.buf, IP_CHECK, 0)
+        struct.pack_into('!H', self.buf, IP_CHECK, fast_checksum(memoryview(self.buf)[:self.ihl]))
+        struct.pack_into('!H', self.buf, self.l4_check, 0)
+        psh = bytes(self.buf[IP_SRC:IP_DST + 4]) + struct.pack('!BBH', 0, self.proto, len(self.buf) - self.l4)
+        self._put_l4_check(fast_checksum(psh + self.buf[self.l4:]))
+
+    def _put_l4_check(self, check):
+        if self.proto == socket.IPPROTO_UDP and check == 0:
+            check = 0xffff  # 0 means "no checksum" for UDP
+        struct.pack_into('!H', self.buf, self.l4_check, check)
+
+    def _patch16(self, offset, value, ip=False, l4=False):
+        old = struct.unpack_from('!H', self.buf, offset)[0]
+        struct.pack_into('!H', self.buf, offset, value)
+        if ip:
+            check = struct.unpack_from('!H', self.buf, IP_CHECK)[0]
+            struct.pack_into('!H', self.buf, IP_CHECK, checksum_update(check, old, value))
+        if l4:
+            check = struct.unpack_from('!H', self.buf, self.l4_check)[0]
+            self._put_l4_check(checksum_update(check, old, value))
+
+    def _patch32(self, offset, value, ip=False, l4=False):
+        old = struct.unpack_from('!L', self.buf, offset)[0]
+        struct.pack_into('!L', self.buf, offset, value)
+        if ip:
+            check = struct.unpack_from('!H', self.buf, IP_CHECK)[0]
+            struct.pack_into('!H', self.buf, IP_CHECK, checksum_update32(check, old, value))
+        if l4:
+            check = struct.unpack_from('!H', self.buf, self.l4_check)[0]
+            self._put_l4_check(checksum_update32(check, old, value))
+
+    # addresses are also part of the TCP/UDP pseudo header
+    def set_src(self, source_ip):
+        self._patch32(IP_SRC, ip2int(source_ip), ip=True, l4=True)
+
+    def set_dst(self, dest_ip):
+        self._patch32(IP_DST, ip2int(dest_ip), ip=True, l4=True)
+
+    def set_ttl(self, ttl):
+        # ttl shares its 16-bit word with the protocol number
+        self._patch16(IP_TTL, (ttl << 8) | self.proto, ip=True)
+
+    def set_tos(self, tos):
+        self._patch16(0, (self.buf[0] << 8) | tos, ip=True)
+
+    def set_id(self, pid):
+        self._patch16(IP_ID, pid, ip=True)
+
+    def set_ports(self, srcp=None, dstp=None):
+        if srcp is not None:
+            self._patch16(self.l4, srcp, l4=True)
+        if dstp is not None:
+            self._patch16(self.l4 + 2, dstp, l4=True)
+
+    def set_seq(self, seq):
+        self._patch32(self.l4 + 4, seq & 0xffffffff, l4=True)
+
+    def set_ack(self, ackno):
+        self._patch32(self.l4 + 8, ackno & 0xffffffff, l4=True)
+
+    def packet(self):
+        return self.buf
+
+
+"""
+Build a TCP probe template (e.g. an ECN-setup SYN with flags [0,1,1,0,0,0,0,1,0]).
+options   = raw TCP option bytes, padded to a multiple of 4 (e.g. MSS b'\x02\x04\x05\xb4')
+The remaining arguments are the same as construct_ip_header/construct_tcp_header.
+"""
+
+
+def tcp_template(source_ip, dest_ip, srcp, dstp, seq=0, ackno=0, flags=(0, 0, 0, 0, 0, 0, 0, 1, 0), options=b"",
+                 user_data=b"", tos=0, ttl=64, pid=0, wsize=8192):
+    options = options + b"\x00" * (-len(options) % 4)
+    ip_header = construct_ip_header(source_ip, dest_ip, tos=tos, pid=pid, ttl=ttl, proto=socket.IPPROTO_TCP)
+    tcp_header = construct_tcp_header(source_ip, dest_ip, srcp, dstp, seq, ackno, flags, user_data=b"",
+                                      doff=5 + len(options) // 4, wsize=wsize)
+    return ProbeTemplate(ip_header, tcp_header + options, user_data)
+
+
+"""
+Build a UDP probe template (e.g. a traceroute probe, the TTL is patched per hop with set_ttl).
+"""
+
+
+def udp_template(source_ip, dest_ip, srcp, dstp, user_data=b"", tos=0, ttl=64, pid=0):
+    ip_header = construct_ip_header(source_ip, dest_ip, tos=tos, pid=pid, ttl=ttl, proto=socket.IPPROTO_UDP)
+    udp_header = construct_udp_header(source_ip, dest_ip, srcp, dstp, user_data)
+    return ProbeTemplate(ip_header, udp_header, user_data)
+
+
+"""
+Parse an ICMP error reply (time exceeded, destination unreachable, ...) that quotes one of our probes.
+buf    = bytes, bytearray or memoryview holding the reply; nothing is copied, fields are read with
+         precompiled structs straight from the buffer
+offset = where the outer IPv4 header starts (0 for raw IP sockets, the link header length for
+         packet sockets/ring frames)
+Returns an ICMPReply or None when the packet is not an ICMP error quoting a TCP/UDP header.
+Addresses are returned as integers (see int2ip), ports are 0 when the quote is too short.
+"""
+
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+# error messages that quote the original datagram
+ICMP_ERROR_TYPES = frozenset((3, 4, 5, 11, 12))
+
+ICMPReply = namedtuple('ICMPReply', ['src', 'tos', 'ttl', 'icmp_type', 'icmp_code', 'inner_tos', 'inner_id',
+                                     'inner_ttl', 'inner_proto', 'inner_src', 'inner_dst', 'sport', 'dport'])
+
+_ip_struct = struct.Struct('!BBHHHBBHII')
+_icmp_struct = struct.Struct('!BB')
+_ports_struct = struct.Struct('!HH')
+
+
+def parse_icmp_reply(buf, offset=0):
+    if len(buf) < offset + 48:  # outer IP + ICMP header + quoted IP header
+        return None
+    ver_ihl, tos, _, _, _, ttl, proto, _, src, _ = _ip_struct.unpack_from(buf, offset)
+    if ver_ihl >> 4 != 4 or proto != socket.IPPROTO_ICMP:
+        return None
+    icmp = offset + (ver_ihl & 0x0f) * 4
+    icmp_type, icmp_code = _icmp_struct.unpack_from(buf, icmp)
+    if icmp_type not in ICMP_ERROR_TYPES:
+        return None
+    inner = icmp + 8
+    if len(buf) < inner + 20:
+        return None
+    inner_ver_ihl, inner_tos, _, inner_id, _, inner_ttl, inner_proto, _, inner_src, inner_dst = \
+        _ip_struct.unpack_from(buf, inner)
+    if inner_proto not in (socket.IPPROTO_TCP, socket.IPPROTO_UDP):
+        return None
+    ports = inner + (inner_ver_ihl & 0x0f) * 4
+    sport = dport = 0
+    if len(buf) >= ports + 4:
+        sport, dport = _ports_struct.unpack_from(buf, ports)
+    return ICMPReply(src, tos, ttl, icmp_type, icmp_code, inner_tos, inner_id, inner_ttl, inner_proto,
+                     inner_src, inner_dst, sport, dport)
+
+
+"""
+Parse a batch of replies (e.g. one capture block) at once, dropping everything that is not an ICMP error.
+"""
+
+
+def parse_icmp_replies(bufs, offset=0):
+    replies = []
+    for buf in bufs:
+        reply = parse_icmp_reply(buf, offset)
+        if reply is not None:
+            replies.append(reply)
+    return replies
+
+
 class IP(Structure):
     _fields_ = [
         ("ihl", c_ubyte, 4),
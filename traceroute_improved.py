@@ -25,6 +25,11 @@ from tqdm import tqdm
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Optional, Tuple
 import threading
+import ipaddress
+import itertools
+from ecn_cache import DEFAULT_MAX_AGE, ProbeCache, cached_at
+from ecn_sources import ProbeSource, RateBudget, parse_source
+from traceroute_raw import RawTracerouteProber
 
 # 로깅 설정
 logging.basicConfig(
@@ -68,13 +73,33 @@ class TracerouteResult:
 class TracerouteWorker:
     """멀티스레드 트레이스루트 작업자 클래스"""
     
-    def __init__(self, max_workers: int = 5, timeout: float = 0.3, max_hops: int = 30):
+    def __init__(self, max_workers: int = 5, timeout: float = 0.3, max_hops: int = 30,
+                 families: Tuple[int, ...] = (4,), cache: Optional[str] = None,
+                 cache_max_age: float = DEFAULT_MAX_AGE, sources: Optional[List[ProbeSource]] = None,
+                 rate: float = 0.0, raw: bool = False,
+                 ring: bool = False, batch: int = 0):
         self.max_workers = max_workers
+        # 도메인을 조회할 주소족 (4, 6 또는 둘 다 - 둘 다이면 도메인마다 두 번 수행)
+        self.families = families
         self.timeout = timeout
         self.max_hops = max_hops
         self.results_lock = Lock()
         self.results = []
         self.my_ip = self._get_my_ip()
+        # cache: cache_max_age 초 이내에 이 vantage 에서 수행한 대상 IP 는 다시 프로브하지 않음
+        self.cache = ProbeCache(cache, self.my_ip, cache_max_age) if cache else None
+        # 측정 출발지 (주소/인터페이스, 초당 홉 프로브 수 예산), 대상마다 번갈아 사용
+        self.sources = list(sources) if sources else [ProbeSource()]
+        for source in self.sources:
+            source.budget = RateBudget(source.rate or rate)
+        self._source_cycle = itertools.cycle(self.sources)
+        # raw: IPv4 홉 프로브를 scapy sr() 대신 raw 소켓 백엔드로 전송 (IPv6 대상은 계속 scapy 사용)
+        # ring: 응답을 출발지 인터페이스마다 TPACKET_V3 링으로 수신 (raw 백엔드 포함)
+        # batch: 대상마다 모든 홉 프로브를 sendmmsg 로 한 번에 보내고 ICMP 응답은 recvmmsg 로 수신 (raw 백엔드 포함)
+        self.raw_prober = None
+        if raw or ring or batch > 1:
+            interfaces = sorted({source.interface for source in self.sources if source.interface})
+            self.raw_prober = RawTracerouteProber(ring=ring, interfaces=interfaces or None, batch=batch)
         
     def _get_my_ip(self) -> str:
         """내 IP 주소를 가져오는 함수"""
@@ -93,25 +118,80 @@ class TracerouteWorker:
             if not ip or ip.strip() == "" or ip.upper() in ["N/A", "NULL", "NONE", "UNDEFINED"]:
                 return False
             
-            # IP 주소 형식 검증
-            parts = ip.split('.')
-            if len(parts) != 4:
-                return False
-            
-            for part in parts:
-                if not part.isdigit():
-                    return False
-                num = int(part)
-                if num < 0 or num > 255:
-                    return False
-            
+            # IP 주소 형식 검증 (IPv4/IPv6)
+            ipaddress.ip_address(ip.strip())
             return True
         except:
             return False
     
-    def perform_traceroute(self, domain_info: Tuple[int, str, str]) -> Optional[TracerouteResult]:
+    def _next_source(self, ip_addr: str) -> Optional[ProbeSource]:
+        """대상과 같은 주소족의 출발지를 번갈아 선택 (주소 없는 기본 출발지는 모든 주소족 가능)"""
+        for _ in range(len(self.sources)):
+            source = next(self._source_cycle)
+            if not source.address or (':' in source.address) == (':' in ip_addr):
+                return source
+        return None
+    
+    def _probe_packet(self, ip_addr: str, hop_num: int, src: str = ''):
+        """홉별 UDP 프로브 (ECT(1): IPv4 는 TOS, IPv6 는 traffic class 에 설정)"""
+        if ':' in ip_addr:
+            pkt = IPv6(dst=ip_addr, hlim=hop_num, tc=1)/UDP(sport=53001, dport=80)
+        else:
+            pkt = IP(dst=ip_addr, ttl=hop_num, tos=1)/UDP(sport=53001, dport=80)
+        if src:
+            pkt.src = src
+        return pkt
+    
+    def _icmp_filter(self, ip_addr: str) -> str:
+        """ICMP/ICMPv6 오류 메시지만 수신하는 필터"""
+        if ':' in ip_addr:
+            # ICMPv6 destination unreachable, packet too big, time exceeded, parameter problem, redirect
+            return "(icmp6 and (ip6[40]=1 or ip6[40]=2 or ip6[40]=3 or ip6[40]=4 or ip6[40]=137))"
+        return "(icmp and (icmp[0]=3 or icmp[0]=4 or icmp[0]=5 or icmp[0]=11 or icmp[0]=12))"
+    
+    def _parse_reply(self, query, answer) -> Tuple[int, str, int, int, int]:
+        """(보낸 tos, 응답 출발지, 응답 ttl, 응답 tos, 인용된 원래 패킷의 tos) - IPv6 는 traffic class/hop limit"""
+        if IPv6 in query:
+            return (query[IPv6].tc, answer[IPv6].src, answer[IPv6].hlim, answer[IPv6].tc,
+                    answer[IPerror6].tc)
+        return query[IP].tos, answer[IP].src, answer[IP].ttl, answer[IP].tos, answer[IPerror].tos
+    
+    def _cache_probe(self, source: ProbeSource) -> str:
+        """신선도 캐시의 측정 종류: 출발지마다 경로가 다르므로 출발지 주소를 포함 (기본 출발지는 'traceroute')"""
+        return f"traceroute@{source.address}" if source.address else 'traceroute'
+    
+    def _cached_result(self, domain: str, domain_id: str, ip_addr: str,
+                       source: ProbeSource) -> Optional[TracerouteResult]:
+        """신선도 캐시에 있는 (대상 IP, 출발지) 의 홉 목록으로 결과 생성 (없으면 None)"""
+        if self.cache is None:
+            return None
+        entry = self.cache.get(ip_addr, 0, self._cache_probe(source))
+        if entry is None:
+            return None
+        _, data, measured = entry
+        hops = [TracerouteHop(**hop) for hop in data['hops']]
+        return TracerouteResult(
+            target_domain=domain,
+            target_ip=ip_addr,
+            source_ip=source.address or self.my_ip,
+            timestamp=datetime.now().isoformat(),
+            total_hops=len(hops),
+            successful_hops=data['successful_hops'],
+            bleaching_count=data['bleaching_count'],
+            hops=hops,
+            execution_time=0.0,
+            metadata={
+                'domain_id': domain_id,
+                'cached_at': cached_at(measured),
+                'source_interface': source.interface or '',
+                'timeout': self.timeout,
+                'max_hops': self.max_hops
+            }
+        )
+    
+    def perform_traceroute(self, domain_info: Tuple[int, str, str, int]) -> Optional[TracerouteResult]:
         """단일 도메인에 대한 트레이스루트 수행"""
-        index, domain_id, domain = domain_info
+        index, domain_id, domain, family = domain_info
         
         logger.info(f"[{index+1}] 트레이스루트 시작: {domain} (ID: {domain_id})")
         start_time = time.time()
@@ -122,8 +202,9 @@ class TracerouteWorker:
             return None
         
         try:
-            # 도메인을 IP로 변환
-            ip_addr = socket.gethostbyname(domain)
+            # 도메인을 IP로 변환 (family 에 따라 A 또는 AAAA)
+            af = socket.AF_INET6 if family == 6 else socket.AF_INET
+            ip_addr = ipaddress.ip_address(socket.getaddrinfo(domain, None, af, socket.SOCK_STREAM)[0][4][0]).compressed
             logger.debug(f"도메인 {domain} -> IP {ip_addr}")
             
             # IP 주소 검증
@@ -142,39 +223,80 @@ class TracerouteWorker:
             logger.error(f"예상치 못한 오류 {domain}: {e}")
             return None
         
+        source = self._next_source(ip_addr)
+        if source is None:
+            logger.warning(f"대상 주소족의 출발지가 없습니다: {ip_addr}")
+            return None
+        
+        # 최근에 같은 출발지에서 같은 IP 를 측정했으면 프로브를 보내지 않고 캐시 결과 사용
+        cached = self._cached_result(domain, domain_id, ip_addr, source)
+        if cached is not None:
+            logger.info(f"[{index+1}] 캐시 결과 사용: {domain} -> {ip_addr} ({cached.metadata['cached_at']})")
+            return cached
+        
         # 트레이스루트 수행
         hops = []
         bleaching_count = 0
         successful_hops = 0
         
         # ICMP 필터 설정
-        icmp_filter = "(icmp and (icmp[0]=3 or icmp[0]=4 or icmp[0]=5 or icmp[0]=11 or icmp[0]=12))"
+        icmp_filter = self._icmp_filter(ip_addr)
+        
+        # raw 백엔드는 대상마다 UDP 프로브 템플릿을 한 번 만들고 홉마다 TTL/IP ID 만 바꿔 보냄
+        template = None
+        if self.raw_prober is not None and ':' not in ip_addr:
+            template = self.raw_prober.template(ip_addr, source)
         
         logger.debug(f"트레이스루트 시작: {ip_addr} (최대 {self.max_hops} 홉)")
         
+        # 배치 모드: 모든 홉 프로브를 한 번에 보내고 목적지 응답까지의 홉별 (전송 시각, 응답) 을 받아 둠
+        replies = None
+        if template is not None and self.raw_prober.batch > 1:
+            for _ in range(self.max_hops):
+                source.budget.wait()
+            try:
+                replies = self.raw_prober.probe_path(template, ip_addr, self.max_hops, self.timeout, source)
+            except Exception as e:
+                logger.error(f"배치 프로브 전송 중 오류 {ip_addr}: {e}")
+                replies = []
+        
         for hop_num in range(1, self.max_hops + 1):
+            if replies is not None and hop_num > len(replies):
+                break
             hop_start_time = time.time()
             
             try:
-                # UDP 패킷으로 트레이스루트 수행
-                res, unans = sr(
-                    IP(dst=ip_addr, ttl=hop_num, tos=1)/UDP(sport=53001, dport=80),
-                    timeout=self.timeout,
-                    filter=icmp_filter,
-                    verbose=0
-                )
-                
-                response_time = time.time() - hop_start_time
+                # UDP 패킷으로 트레이스루트 수행 (출발지별 초당 프로브 수 제한)
+                if replies is None:
+                    source.budget.wait()
+                if template is not None:
+                    if replies is not None:
+                        # 배치 모드의 응답 시간은 전송 시각과 커널 수신 시각의 차이
+                        sent_time, reply = replies[hop_num - 1]
+                        response_time = reply.received - sent_time if reply is not None else self.timeout
+                    else:
+                        reply = self.raw_prober.probe(template, ip_addr, hop_num, self.timeout, source)
+                        response_time = time.time() - hop_start_time
+                    answer = None
+                    if reply is not None:
+                        answer = (template.buf[rs.IP_TOS], reply.icmp_src, reply.icmp_ttl, reply.icmp_tos,
+                                  reply.iperror_tos)
+                else:
+                    res, unans = sr(
+                        self._probe_packet(ip_addr, hop_num, source.address),
+                        iface=source.interface,
+                        timeout=self.timeout,
+                        filter=icmp_filter,
+                        verbose=0
+                    )
+                    answer = self._parse_reply(res[0].query, res[0].answer) if len(res) > 0 else None
+                    response_time = time.time() - hop_start_time
                 
-                if len(res) > 0:
+                if answer is not None:
                     successful_hops += 1
                     
                     # 응답 패킷 분석
-                    sent_tos = res[0].query[IP].tos
-                    icmp_tos = res[0].answer[IP].tos
-                    icmp_src = res[0].answer[IP].src
-                    icmp_ttl = res[0].answer[IP].ttl
-                    iperror_tos = res[0].answer[IPerror].tos
+                    sent_tos, icmp_src, icmp_ttl, icmp_tos, iperror_tos = answer
                     icmp_ecn_bit = icmp_tos & 0x3
                     iperror_ecn_bit = iperror_tos & 0x3
                     
@@ -240,7 +362,7 @@ class TracerouteWorker:
         result = TracerouteResult(
             target_domain=domain,
             target_ip=ip_addr,
-            source_ip=self.my_ip,
+            source_ip=source.address or self.my_ip,
             timestamp=datetime.now().isoformat(),
             total_hops=len(hops),
             successful_hops=successful_hops,
@@ -250,11 +372,21 @@ class TracerouteWorker:
             metadata={
                 'domain_id': domain_id,
                 'worker_thread': threading.current_thread().name,
+                'source_interface': source.interface or '',
+                'backend': 'raw' if template is not None else 'scapy',
                 'timeout': self.timeout,
                 'max_hops': self.max_hops
             }
         )
         
+        if self.cache is not None and successful_hops > 0:
+            reached = hops[-1].ip_address == ip_addr
+            self.cache.put(ip_addr, 0, self._cache_probe(source), 'reached' if reached else 'unreached', {
+                'hops': [asdict(hop) for hop in hops],
+                'successful_hops': successful_hops,
+                'bleaching_count': bleaching_count
+            })
+        
         logger.info(f"[{index+1}] 트레이스루트 완료: {domain} -> {ip_addr} "
                    f"(성공: {successful_hops}/{len(hops)} 홉, "
                    f"ECN bleaching: {bleaching_count}, "
@@ -288,6 +420,7 @@ class TracerouteWorker:
                 'total_targets': len(results),
                 'successful_traceroutes': len([r for r in results if r.successful_hops > 0]),
                 'total_bleaching_incidents': sum(r.bleaching_count for r in results),
+                'cached_traceroutes': len([r for r in results if 'cached_at' in r.metadata]),
                 'average_execution_time': sum(r.execution_time for r in results) / len(results) if results else 0,
                 'timestamp': timestamp,
                 'source_ip': self.my_ip
@@ -299,7 +432,8 @@ class TracerouteWorker:
                     'successful_hops': r.successful_hops,
                     'total_hops': r.total_hops,
                     'bleaching_count': r.bleaching_count,
-                    'execution_time': r.execution_time
+                    'execution_time': r.execution_time,
+                    'cached_at': r.metadata.get('cached_at', '')
                 }
                 for r in results
             ]
@@ -325,6 +459,7 @@ class TracerouteWorker:
         successful_count = len([r for r in results if r.successful_hops > 0])
         total_bleaching = sum(r.bleaching_count for r in results)
         avg_time = sum(r.execution_time for r in results) / len(results)
+        cached_count = len([r for r in results if 'cached_at' in r.metadata])
         
         logger.info("=" * 60)
         logger.info("트레이스루트 결과 통계")
@@ -332,6 +467,8 @@ class TracerouteWorker:
         logger.info(f"총 대상: {len(results)}개")
         logger.info(f"성공한 트레이스루트: {successful_count}개 ({successful_count/len(results)*100:.1f}%)")
         logger.info(f"총 ECN bleaching 발생: {total_bleaching}회")
+        if cached_count:
+            logger.info(f"캐시에서 가져온 결과: {cached_count}개")
         logger.info(f"평균 실행 시간: {avg_time:.2f}초")
         logger.info("=" * 60)
     
@@ -348,8 +485,8 @@ class TracerouteWorker:
             logger.error(f"IP 리스트 파일 읽기 실패: {e}")
             return []
         
-        # 도메인 정보 준비
-        domain_infos = [(i, item[0], item[1]) for i, item in enumerate(ip_list)]
+        # 도메인 정보 준비 (주소족마다 하나씩)
+        domain_infos = [(i, item[0], item[1], family) for i, item in enumerate(ip_list) for family in self.families]
         
         results = []
         
@@ -365,7 +502,7 @@ class TracerouteWorker:
             with tqdm(total=len(domain_infos), desc="트레이스루트 진행률") as pbar:
                 for future in as_completed(future_to_domain):
                     domain_info = future_to_domain[future]
-                    index, domain_id, domain = domain_info
+                    index, domain_id, domain, family = domain_info
                     
                     try:
                         result = future.result()
@@ -382,6 +519,10 @@ class TracerouteWorker:
                         logger.error(f"도메인 {domain} 처리 중 예외 발생: {e}")
                         pbar.update(1)
         
+        if self.cache is not None:
+            self.cache.commit()
+        if self.raw_prober is not None:
+            self.raw_prober.close()
         logger.info(f"모든 트레이스루트 완료. 총 {len(results)}개 결과 수집")
         return results
 
@@ -392,6 +533,19 @@ def main():
     parser.add_argument('--workers', type=int, default=5, help='동시 실행할 워커 수 (기본값: 5)')
     parser.add_argument('--timeout', type=float, default=0.3, help='패킷 타임아웃 (기본값: 0.3초)')
     parser.add_argument('--max-hops', type=int, default=30, help='최대 홉 수 (기본값: 30)')
+    parser.add_argument('--family', choices=['4', '6', 'both'], default='4', help='도메인 조회 주소족 (기본값: 4)')
+    parser.add_argument('--cache', default=None,
+                        help='신선도 캐시 sqlite 파일: --cache-max-age 이내에 수행한 대상 IP 는 다시 프로브하지 않음')
+    parser.add_argument('--cache-max-age', type=float, default=24.0, help='캐시 결과의 최대 유효 시간 (시간, 기본값: 24)')
+    parser.add_argument('--source', type=parse_source, action='append', default=None,
+                        help='측정 출발지 ADDR[@IFACE][/RATE], 여러 번 지정하면 대상을 번갈아 배분')
+    parser.add_argument('--rate', type=float, default=0.0, help='출발지별 초당 홉 프로브 수, 0 은 무제한 (기본값: 0)')
+    parser.add_argument('--raw', action='store_true',
+                        help='IPv4 홉 프로브를 scapy 대신 raw 소켓 백엔드로 전송 (IP_HDRINCL 송신 + ICMP 수신 소켓)')
+    parser.add_argument('--ring', action='store_true',
+                        help='--raw 백엔드의 응답을 인터페이스별 TPACKET_V3 링 + 미리 만든 BPF 로 수신')
+    parser.add_argument('--batch', type=int, default=0,
+                        help='대상마다 홉 프로브를 sendmmsg 로 한 번에 보내고 ICMP 응답을 recvmmsg 로 최대 N 개씩 수신 (--raw 포함)')
     parser.add_argument('--output-dir', default='traceroute', help='출력 디렉토리 (기본값: traceroute)')
     
     args = parser.parse_args()
@@ -406,7 +560,15 @@ def main():
     worker = TracerouteWorker(
         max_workers=args.workers,
         timeout=args.timeout,
-        max_hops=args.max_hops
+        max_hops=args.max_hops,
+        families=(4, 6) if args.family == 'both' else (int(args.family),),
+        cache=args.cache,
+        cache_max_age=args.cache_max_age * 3600,
+        sources=args.source,
+        rate=args.rate,
+        raw=args.raw,
+        ring=args.ring,
+        batch=args.batch
     )
     
     try:
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import time
+import socket
+import logging
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import tcppacket as rs
+from batch_io import BatchReceiver, BatchSender
+from capture_ring import RingCapture, default_interface
+from ecn_sources import ProbeSource
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class HopReply:
+    """홉 프로브에 대한 ICMP 오류 응답 (바깥 IP 헤더 + 인용된 원래 패킷의 TOS)"""
+    icmp_src: str
+    icmp_ttl: int
+    icmp_tos: int
+    iperror_tos: int
+    icmp_type: int
+    icmp_code: int
+    received: float
+
+
+class _PendingProbe:
+    __slots__ = ('event', 'reply')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reply: Optional[HopReply] = None
+
+
+class RawTracerouteProber:
+    """scapy 없이 IPv4 트레이스루트 홉 프로브를 보내고 ICMP 오류 응답을 받는 백엔드
+
+    출발지마다 IP_HDRINCL raw 소켓 하나로 UDP 프로브 템플릿(tcppacket.udp_template)의 바이트를 보내고,
+    ICMP raw 소켓 하나를 수신 스레드가 읽어 (tcppacket.parse_icmp_reply) 인용된 원래 헤더의 (목적지, IP ID) 로
+    기다리는 프로브에 전달한다.
+    IP ID 는 프로브마다 새로 부여하므로 여러 워커 스레드가 같은 포트로 동시에 보내도 응답이 섞이지 않는다.
+    ring 이면 ICMP raw 소켓 대신 인터페이스마다 ICMP 오류 필터를 붙인 TPACKET_V3 링(capture_ring)에서 블록 단위로 받는다.
+    batch > 1 이면 probe_path() 가 모든 홉 프로브를 sendmmsg 로 한 번에 보내고, ICMP 소켓은 recvmmsg 로
+    최대 batch 개씩 커널 수신 시각과 함께 읽는다.
+    """
+
+    def __init__(self, sport: int = 53001, dport: int = 80, tos: int = 1, ring: bool = False,
+                 interfaces: Optional[List[str]] = None, batch: int = 0):
+        self.sport = sport
+        self.dport = dport
+        self.tos = tos
+        self.batch = batch
+        self._pending: Dict[Tuple[int, int], _PendingProbe] = {}
+        self._pending_lock = threading.Lock()
+        self._ip_ids = itertools.count(1)
+        self._send_sockets: Dict[Tuple[str, Optional[str]], socket.socket] = {}
+        # 배치 송신기는 슬롯 버퍼를 공유하므로 출발지별 lock 과 함께 보관
+        self._senders: Dict[Tuple[str, Optional[str]], Tuple[BatchSender, threading.Lock]] = {}
+        self._socket_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._recv_socket = None
+        self._rings: List[RingCapture] = []
+        if ring:
+            self._rings = [RingCapture(interface) for interface in interfaces or [default_interface()]]
+            self._receivers = [threading.Thread(target=self._ring_loop, args=(capture,),
+                                                name=f'ring-receiver-{capture.interface}', daemon=True)
+                               for capture in self._rings]
+        else:
+            self._recv_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self._recv_socket.settimeout(0.2)
+            self._receivers = [threading.Thread(target=self._receive_loop, name='raw-icmp-receiver', daemon=True)]
+        for receiver in self._receivers:
+            receiver.start()
+
+    def _send_socket(self, source: ProbeSource) -> socket.socket:
+        """출발지별 송신 raw 소켓 (IPPROTO_RAW 는 IP_HDRINCL 포함, 인터페이스가 있으면 그 장치로 고정)"""
+        key = (source.address, source.interface)
+        with self._socket_lock:
+            sock = self._send_sockets.get(key)
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+                if source.interface:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, source.interface.encode())
+                self._send_sockets[key] = sock
+        return sock
+
+    def _sender(self, source: ProbeSource) -> Tuple[BatchSender, threading.Lock]:
+        key = (source.address, source.interface)
+        sock = self._send_socket(source)
+        with self._socket_lock:
+            if key not in self._senders:
+                self._senders[key] = (BatchSender(sock, self.batch), threading.Lock())
+            return self._senders[key]
+
+    @staticmethod
+    def route_source(ip_addr: str) -> str:
+        """커널 라우팅이 ip_addr 로 보낼 때 사용할 출발지 주소 (UDP connect 는 패킷을 보내지 않음)"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect((ip_addr, 9))
+            return sock.getsockname()[0]
+
+    def template(self, ip_addr: str, source: ProbeSource) -> rs.ProbeTemplate:
+        """대상 하나의 UDP 프로브 템플릿 (홉마다 TTL 과 IP ID 만 바꿔 보냄), 워커 스레드마다 따로 사용"""
+        source_ip = source.address or self.route_source(ip_addr)
+        return rs.udp_template(source_ip, ip_addr, self.sport, self.dport, tos=self.tos)
+
+    def probe(self, template: rs.ProbeTemplate, ip_addr: str, hop_num: int, timeout: float,
+              source: ProbeSource) -> Optional[HopReply]:
+        """TTL=hop_num 프로브 하나를 보내고 timeout 초 동안 ICMP 오류 응답을 기다림 (없으면 None)"""
+        dst = rs.ip2int(ip_addr)
+        ip_id, pending = self._register(dst)
+        try:
+            template.set_ttl(hop_num)
+            template.set_id(ip_id)
+            self._send_socket(source).sendto(template.packet(), (ip_addr, 0))
+            pending.event.wait(timeout)
+        finally:
+            with self._pending_lock:
+                self._pending.pop((dst, ip_id), None)
+        return pending.reply
+
+    def _register(self, dst: int) -> Tuple[int, _PendingProbe]:
+        pending = _PendingProbe()
+        with self._pending_lock:
+            # 0 은 일부 장비가 인용할 때 지우는 값이므로 건너뜀
+            ip_id = next(self._ip_ids) & 0xffff or next(self._ip_ids) & 0xffff
+            self._pending[(dst, ip_id)] = pending
+        return ip_id, pending
+
+    def probe_path(self, template: rs.ProbeTemplate, ip_addr: str, max_hops: int, timeout: float,
+                   source: ProbeSource) -> List[Tuple[float, Optional[HopReply]]]:
+        """TTL 1..max_hops 프로브를 한 번에 보내고 홉별 (전송 시각, 응답 또는 None) 목록 반환
+
+        목적지의 응답이 온 홉까지만 반환하며, 모든 홉의 응답을 합쳐 timeout 초까지만 기다린다.
+        """
+        dst = rs.ip2int(ip_addr)
+        probes = [self._register(dst) for _ in range(max_hops)]
+        try:
+            sender, lock = self._sender(source)
+            sent_times = []
+            with lock:
+                for hop_num, (ip_id, _) in enumerate(probes, 1):
+                    template.set_ttl(hop_num)
+                    template.set_id(ip_id)
+                    if sender.queue(template.packet()):
+                        sent_times.extend(sender.flush())
+                sent_times.extend(sender.flush())
+            deadline = time.time() + timeout
+            path = []
+            for (ip_id, pending), sent_at in zip(probes, sent_times):
+                pending.event.wait(max(0.0, deadline - time.time()))
+                path.append((sent_at, pending.reply))
+                if pending.reply is not None and pending.reply.icmp_src == ip_addr:
+                    break
+            return path
+        finally:
+            with self._pending_lock:
+                for ip_id, _ in probes:
+                    self._pending.pop((dst, ip_id), None)
+
+    def _receive_loop(self):
+        if self.batch > 1:
+            self._batch_receive_loop()
+            return
+        # 수신 버퍼 하나를 재사용하고 파서에는 memoryview 로 넘김 (패킷마다 bytes 를 만들지 않음)
+        buf = bytearray(65535)
+        view = memoryview(buf)
+        while not self._stop.is_set():
+            try:
+                size = self._recv_socket.recv_into(buf)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self._dispatch(view[:size], time.time())
+
+    def _batch_receive_loop(self):
+        receiver = BatchReceiver(self._recv_socket, self.batch)
+        while not self._stop.is_set():
+            try:
+                packets = receiver.recv(0.2)
+            except OSError:
+                break
+            for received, data in packets:
+                self._dispatch(data, received)
+
+    def _ring_loop(self, capture: RingCapture):
+        # 프레임은 링 메모리를 가리키므로 블록을 돌려주기 전에 모두 파싱
+        for frames in capture.blocks():
+            for received, frame in frames:
+                self._dispatch(frame, received)
+
+    def _dispatch(self, data: memoryview, received: float):
+        """ICMP 오류 응답에서 인용된 원래 UDP 프로브를 찾아 기다리는 프로브에 전달"""
+        reply = rs.parse_icmp_reply(data)
+        if reply is None or reply.inner_proto != socket.IPPROTO_UDP:
+            return
+        if reply.sport != self.sport or reply.dport != self.dport:
+            return
+        with self._pending_lock:
+            pending = self._pending.get((reply.inner_dst, reply.inner_id))
+            if pending is None or pending.reply is not None:
+                return
+            pending.reply = HopReply(
+                icmp_src=rs.int2ip(reply.src),
+                icmp_ttl=reply.ttl,
+                icmp_tos=reply.tos,
+                iperror_tos=reply.inner_tos,
+                icmp_type=reply.icmp_type,
+                icmp_code=reply.icmp_code,
+                received=received
+            )
+        pending.event.set()
+
+    def close(self):
+        self._stop.set()
+        for capture in self._rings:
+            capture.stop()
+        for receiver in self._receivers:
+            receiver.join(1)
+        if self._recv_socket is not None:
+            self._recv_socket.close()
+        for capture in self._rings:
+            capture.close()
+        with self._socket_lock:
+            for sock in self._send_sockets.values():
+                sock.close()
+            self._send_sockets.clear()